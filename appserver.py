@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+常駐アプリケーションサーバー（gunicorn）の起動・停止・再読み込み
+
+使い方:
+    python appserver.py start    # 起動
+    python appserver.py stop     # 停止（処理中のリクエストは完了させる）
+    python appserver.py reload   # 新しいコードでワーカーを順次入れ替える（デプロイ後に実行）
+    python appserver.py status   # 稼働状況の表示
+    python appserver.py ensure   # 停止していれば起動（cronから定期実行する）
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_PATH = Path(__file__).resolve().parent
+CONFIG = PROJECT_PATH / 'core' / 'gunicorn.conf.py'
+PIDFILE = Path(os.environ.get('SHIFT_APP_PIDFILE', PROJECT_PATH / 'run' / 'gunicorn.pid'))
+SOCKET = Path(os.environ.get('SHIFT_APP_SOCKET', PROJECT_PATH / 'run' / 'gunicorn.sock'))
+
+
+def read_pid():
+    """稼働中のマスタープロセスのPID（停止していれば None）"""
+    try:
+        pid = int(PIDFILE.read_text().strip())
+        os.kill(pid, 0)
+    except (FileNotFoundError, ValueError, ProcessLookupError):
+        return None
+    except PermissionError:
+        pass
+    return pid
+
+
+def start():
+    if read_pid():
+        print('すでに起動しています')
+        return True
+    (PROJECT_PATH / 'run').mkdir(exist_ok=True)
+    (PROJECT_PATH / 'logs').mkdir(exist_ok=True)
+    # 前回異常終了したときのソケットが残っているとCGIが転送してしまうため削除する
+    SOCKET.unlink(missing_ok=True)
+    result = subprocess.run(
+        [sys.executable, '-m', 'gunicorn', '--config', str(CONFIG)], cwd=PROJECT_PATH
+    )
+    if result.returncode != 0:
+        print('起動に失敗しました（logs/gunicorn_error.log を確認してください）')
+        return False
+    for _ in range(50):
+        if read_pid() and SOCKET.exists():
+            print(f'起動しました（PID {read_pid()}）')
+            return True
+        time.sleep(0.1)
+    print('起動を確認できませんでした（logs/gunicorn_error.log を確認してください）')
+    return False
+
+
+def stop():
+    pid = read_pid()
+    if not pid:
+        print('起動していません')
+        return True
+    # SIGTERM: 処理中のリクエストを完了させてから終了する（graceful_timeout まで待つ）
+    os.kill(pid, signal.SIGTERM)
+    for _ in range(400):
+        if not read_pid():
+            print('停止しました')
+            return True
+        time.sleep(0.1)
+    print('停止を確認できませんでした')
+    return False
+
+
+def reload():
+    pid = read_pid()
+    if not pid:
+        print('起動していないため起動します')
+        return start()
+    # SIGHUP: 設定とコードを読み込み直した新しいワーカーを起動し、古いワーカーを順次終了する
+    os.kill(pid, signal.SIGHUP)
+    print(f'再読み込みを指示しました（PID {pid}）')
+    return True
+
+
+def status():
+    pid = read_pid()
+    if pid:
+        print(f'稼働中（PID {pid}、ソケット {SOCKET}）')
+    else:
+        print('停止中（django.cgi はリクエストごとにDjangoを起動して処理します）')
+    return bool(pid)
+
+
+def ensure():
+    return bool(read_pid()) or start()
+
+
+COMMANDS = {'start': start, 'stop': stop, 'reload': reload, 'status': status, 'ensure': ensure}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] not in COMMANDS:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(0 if COMMANDS[sys.argv[1]]() else 1)
@@ -0,0 +1,32 @@
+"""
+常駐アプリケーションサーバー（gunicorn）用のWSGIアプリケーション
+
+django.cgi から転送されたリクエストの SCRIPT_NAME・PATH_INFO・REMOTE_ADDR・スキームを、
+CGIで直接Djangoを起動した場合（wsgiref の CGIHandler）と同じ値に戻す。
+これにより、どちらの方式でもURLの解決・reverse()・クライアントのアドレスが一致する。
+
+gunicorn はUNIXソケット（CGIシムからのみ接続できる）で待ち受けており、
+X-Cgi-* ヘッダーはシムが付け直すため（クライアントからの同名ヘッダーは転送しない）信頼してよい。
+"""
+
+from urllib.parse import unquote_to_bytes
+
+from core.wsgi import application as django_application
+
+# 転送ヘッダー → WSGI environ のキー（値はパーセントエンコードされたWSGI文字列）
+CGI_HEADERS = {
+    'HTTP_X_CGI_SCRIPT_NAME': 'SCRIPT_NAME',
+    'HTTP_X_CGI_PATH_INFO': 'PATH_INFO',
+    'HTTP_X_CGI_REMOTE_ADDR': 'REMOTE_ADDR',
+}
+
+
+def application(environ, start_response):
+    for header, key in CGI_HEADERS.items():
+        value = environ.pop(header, None)
+        if value is not None:
+            environ[key] = unquote_to_bytes(value).decode('latin-1')
+    scheme = environ.pop('HTTP_X_CGI_URL_SCHEME', None)
+    if scheme in ('http', 'https'):
+        environ['wsgi.url_scheme'] = scheme
+    return django_application(environ, start_response)
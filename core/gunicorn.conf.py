@@ -0,0 +1,50 @@
+"""
+常駐アプリケーションサーバー（gunicorn）の設定
+
+django.cgi はこのサーバーが起動していればリクエストをUNIXソケット経由で転送し、
+起動していなければ従来どおりリクエストごとにDjangoを起動して処理する。
+起動・再起動は appserver.py から行う。
+"""
+
+import multiprocessing
+import os
+
+project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+run_dir = os.path.join(project_path, 'run')
+
+# .envファイルから環境変数を読み込み（ワーカーに引き継がれる）
+try:
+    from dotenv import load_dotenv
+    env_path = os.path.join(project_path, '.env')
+    if os.path.exists(env_path):
+        load_dotenv(env_path)
+except ImportError:
+    pass
+
+# django.cgi から転送された SCRIPT_NAME・PATH_INFO・REMOTE_ADDR を戻してからDjangoに渡す
+wsgi_app = 'core.appserver_wsgi:application'
+chdir = project_path
+raw_env = ['DJANGO_PRODUCTION=True', 'DJANGO_SETTINGS_MODULE=core.settings_production']
+
+# CGIシムからのみ接続できるよう、TCPではなくUNIXソケットで待ち受ける
+bind = 'unix:' + os.environ.get('SHIFT_APP_SOCKET', os.path.join(run_dir, 'gunicorn.sock'))
+umask = 0o007
+pidfile = os.environ.get('SHIFT_APP_PIDFILE', os.path.join(run_dir, 'gunicorn.pid'))
+daemon = True
+
+# 事前にforkしたワーカー。各ワーカーはDB接続を CONN_MAX_AGE の間使い回す
+workers = int(os.environ.get('SHIFT_APP_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 5)))
+worker_class = 'sync'
+# PDF作成（SHIFT_PDF_RENDER_TIMEOUT）より長くする
+timeout = 150
+graceful_timeout = 30
+# メモリの肥大化を防ぐため、一定数のリクエストを処理したワーカーは入れ替える
+max_requests = 1000
+max_requests_jitter = 100
+
+# HUPでの再読み込み時に新しいコードを読み込めるよう、アプリはワーカーごとに読み込む
+preload_app = False
+
+accesslog = os.path.join(project_path, 'logs', 'gunicorn_access.log')
+errorlog = os.path.join(project_path, 'logs', 'gunicorn_error.log')
+loglevel = 'warning'
@@ -36,11 +36,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # ビューごとのクエリ数・DB時間の計測（SHIFT_QUERY_BUDGET_ENABLED が True のときのみ）
+    'shift_management.middleware.QueryBudgetMiddleware',
+    # 応答の Server-Timing ヘッダーと処理時間の内訳のログ（SHIFT_SERVER_TIMING_ENABLED が True のときのみ）
+    'shift_management.middleware.ServerTimingMiddleware',
+    # Prometheus 用のビューごとの処理時間・クエリ数（SHIFT_METRICS_ENABLED が True のときのみ）
+    'shift_management.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # スタッフが ?_profile=1 / X-Shift-Profile で要求したリクエストの cProfile（SHIFT_PROFILE_ENABLED が True のときのみ）
+    'shift_management.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -49,7 +57,8 @@ ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates に描画時間の計測（Server-Timing の template）を加えたもの
+        'BACKEND': 'shift_management.timing.TimedDjangoTemplates',
         'DIRS': [
             BASE_DIR / 'templates',
             BASE_DIR / 'shift_management' / 'templates'
@@ -117,3 +126,32 @@ MESSAGE_TAGS = {
     messages.WARNING: 'warning',
     messages.ERROR: 'danger',
 }
+
+# クエリ予算（QueryBudgetMiddleware）
+# 有効にすると、予算を超えたビューを shift_management.queries ロガーに警告として出力する
+SHIFT_QUERY_BUDGET_ENABLED = False
+SHIFT_QUERY_BUDGET_DEFAULT = 20  # ビューごとの既定のクエリ数上限
+SHIFT_QUERY_TIME_BUDGET_MS = 500  # 1リクエストあたりのDB時間の上限（ミリ秒）
+SHIFT_QUERY_BUDGETS = {
+    'shift_management:api_shifts': 5,
+    'shift_management:api_time_chart_bars': 5,
+    'shift_management:calendar': 10,
+    'shift_management:time_chart': 10,
+}
+
+# Server-Timing（ServerTimingMiddleware）
+# shift_management.timing ロガーに、DB・テンプレート描画・PDFレイアウト・Pythonの時間を出力する
+# （応答の Server-Timing ヘッダーは DEBUG のとき、またはビューがユーザーを読み込んだスタッフユーザーにだけ付ける）
+SHIFT_SERVER_TIMING_ENABLED = True
+
+# リクエスト単位のプロファイル（ProfileMiddleware、保存・一覧は shift_profiles コマンド）
+SHIFT_PROFILE_ENABLED = True
+SHIFT_PROFILE_DIR = BASE_DIR / 'profiles'
+SHIFT_PROFILE_MAX_FILES = 50  # これを超えたら古いものから削除する
+SHIFT_PROFILE_TOKEN_MAX_AGE = 60 * 60  # 署名付きトークンの有効期間（秒）
+
+# メトリクス（MetricsMiddleware と /metrics）
+# 値はプロセスごとのファイルとして SHIFT_METRICS_DIR に書き出し、/metrics で合算する
+SHIFT_METRICS_ENABLED = True
+SHIFT_METRICS_DIR = BASE_DIR / 'cache' / 'metrics'
+SHIFT_METRICS_TOKEN = ''  # /metrics を Bearer トークンで取得する場合に設定する（未設定ならスタッフユーザーのみ）
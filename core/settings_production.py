@@ -26,6 +26,10 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', 'your_db_password'),
         'HOST': os.environ.get('DB_HOST', 'mysql1.php.xdomain.ne.jp'),  # Xserverのホスト
         'PORT': '3306',
+        # 常駐サーバー（appserver.py）で動かす場合、ワーカーごとに接続を使い回す
+        # （CGIでは1リクエストごとにプロセスが終わるため効果はない）
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
             'charset': 'utf8mb4',
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
@@ -66,6 +70,10 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
             'style': '{',
         },
+        'timing': {
+            'format': '{asctime} {process:d} {message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'file': {
@@ -74,6 +82,13 @@ LOGGING = {
             'filename': os.path.join(BASE_DIR, 'logs', 'django.log'),
             'formatter': 'verbose',
         },
+        # 処理時間の内訳（Server-Timing と同じ値）を集計しやすいよう別ファイルに出力する
+        'timing': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': os.path.join(BASE_DIR, 'logs', 'timing.log'),
+            'formatter': 'timing',
+        },
         'console': {
             'level': 'ERROR',
             'class': 'logging.StreamHandler',
@@ -90,6 +105,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'shift_management.timing': {
+            'handlers': ['timing'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -101,6 +121,32 @@ CACHES = {
     }
 }
 
+# api_shifts の月単位イベントキャッシュの保持期間（秒）
+SHIFT_EVENTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# PDFエクスポートのキャッシュ（容量と経過時間で古いものから削除）
+SHIFT_PDF_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'pdf')
+SHIFT_PDF_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 200MB
+SHIFT_PDF_CACHE_MAX_AGE = 60 * 60 * 24 * 7  # 7日
+
+# PDFレンダリング用プロセス（数・同時に受け付ける件数・時間制限（秒））
+# プロセスプールは常駐サーバー（appserver.py）でのみ使う。CGIで直接Djangoを起動した場合は
+# django.cgi が SHIFT_PDF_POOL=0 を設定し、リクエストのプロセス内でレンダリングする
+SHIFT_PDF_POOL = os.environ.get('SHIFT_PDF_POOL', '1') == '1'
+SHIFT_PDF_WORKERS = int(os.environ.get('SHIFT_PDF_WORKERS') or 0) or os.cpu_count() or 1
+SHIFT_PDF_MAX_PENDING = 4  # 全プロセスの合計（run/ のロックファイルで数える）
+SHIFT_PDF_RENDER_TIMEOUT = 120
+SHIFT_PDF_SLOT_DIR = os.path.join(BASE_DIR, 'run')
+
+# クエリ予算の超過を logs/django.log に警告として記録する（予算は settings.py の SHIFT_QUERY_BUDGETS）
+SHIFT_QUERY_BUDGET_ENABLED = True
+
+# /metrics の Bearer トークン（値はキャッシュ（FileBasedCache）を通じて全プロセスで共有される）
+SHIFT_METRICS_TOKEN = os.environ.get('SHIFT_METRICS_TOKEN', '')
+
+# CGI起動時間の予算（ミリ秒、manage.py profile_startup --check で確認）
+SHIFT_COLD_START_BUDGET_MS = 1000
+
 # セッション設定
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_AGE = 86400  # 24時間
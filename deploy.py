@@ -28,7 +28,7 @@ def run_command(command, description):
 
 def create_directories():
     """必要なディレクトリを作成"""
-    directories = ['logs', 'cache', 'staticfiles', 'media']
+    directories = ['logs', 'cache', 'profiles', 'run', 'staticfiles', 'media']
     for directory in directories:
         Path(directory).mkdir(exist_ok=True)
         print(f"📁 ディレクトリ作成: {directory}")
@@ -47,6 +47,13 @@ def run_migrations():
         "データベースマイグレーション"
     )
 
+def rebuild_summaries():
+    """スタッフ別・月別の集計をシフトから作り直す（初回作成とずれの補正）"""
+    return run_command(
+        "python manage.py rebuild_staff_summaries --settings=core.settings_production",
+        "月別集計の再作成"
+    )
+
 def create_superuser():
     """スーパーユーザーの作成（対話式）"""
     print("\n👤 スーパーユーザーの作成")
@@ -70,6 +77,13 @@ def check_deployment():
         "デプロイメント設定の確認"
     )
 
+def reload_app_server():
+    """常駐アプリケーションサーバーが稼働中なら、新しいコードでワーカーを入れ替える"""
+    if subprocess.run([sys.executable, "appserver.py", "status"], capture_output=True).returncode != 0:
+        print("\nℹ️ 常駐アプリケーションサーバーは停止中です（CGIで動作します）")
+        return True
+    return run_command(f"{sys.executable} appserver.py reload", "常駐アプリケーションサーバーの再読み込み")
+
 def main():
     """メイン処理"""
     print("🚀 Xserver本番環境デプロイメント開始")
@@ -93,6 +107,16 @@ def main():
         print("❌ データベースマイグレーションに失敗しました。")
         return False
     
+    # 月別集計の再作成
+    if not rebuild_summaries():
+        print("❌ 月別集計の再作成に失敗しました。")
+        return False
+    
+    # 常駐アプリケーションサーバーの再読み込み
+    if not reload_app_server():
+        print("❌ 常駐アプリケーションサーバーの再読み込みに失敗しました。")
+        return False
+    
     # スーパーユーザーの作成
     create_superuser_choice = input("\n❓ スーパーユーザーを作成しますか？ (y/n): ")
     if create_superuser_choice.lower() == 'y':
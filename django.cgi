@@ -29,6 +29,92 @@ try:
 except ImportError:
     pass
 
+# 常駐アプリケーションサーバー（appserver.py で起動）のソケット
+app_socket = os.environ.get('SHIFT_APP_SOCKET', os.path.join(project_path, 'run', 'gunicorn.sock'))
+
+# 転送しないリクエストヘッダー（転送元を示すヘッダーはこのスクリプトで付け直す）
+SKIP_HEADERS = {
+    'HTTP_CONNECTION', 'HTTP_KEEP_ALIVE', 'HTTP_PROXY', 'HTTP_TRANSFER_ENCODING',
+    'HTTP_X_FORWARDED_FOR', 'HTTP_X_FORWARDED_PROTO', 'HTTP_X_FORWARDED_PROTOCOL',
+    'HTTP_X_FORWARDED_SSL',
+}
+# CGIの環境変数を常駐サーバーに渡すヘッダーの接頭辞（core/appserver_wsgi.py が environ に戻す）
+CGI_HEADER_PREFIX = 'HTTP_X_CGI_'
+
+
+def forward_to_app_server(socket_path):
+    """リクエストを常駐サーバーへ転送し、応答をそのまま返す
+
+    サーバーに接続できなければ何も読まずに False を返す（呼び出し元でDjangoを起動して処理する）。
+    """
+    import http.client
+    import socket
+    from urllib.parse import quote
+    from wsgiref.handlers import read_environ
+
+    class UnixHTTPConnection(http.client.HTTPConnection):
+        def connect(self):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(socket_path)
+
+    connection = UnixHTTPConnection('localhost', timeout=160)
+    try:
+        connection.connect()
+    except OSError:
+        return False
+
+    # CGIHandler と同じ変換（WSGI文字列）をした環境変数
+    environ = read_environ()
+    headers = {
+        key[5:].replace('_', '-').title(): value
+        for key, value in environ.items()
+        if key.startswith('HTTP_') and key not in SKIP_HEADERS and not key.startswith(CGI_HEADER_PREFIX)
+    }
+    if environ.get('CONTENT_TYPE'):
+        headers['Content-Type'] = environ['CONTENT_TYPE']
+    scheme = 'https' if environ.get('HTTPS', '').lower() in ('on', '1', 'yes') else 'http'
+    headers['X-Forwarded-For'] = environ.get('REMOTE_ADDR', '')
+    headers['X-Forwarded-Proto'] = scheme
+    # URLの解決・reverse()・クライアントのアドレスがCGIで直接起動した場合と一致するよう、
+    # SCRIPT_NAME・PATH_INFO・REMOTE_ADDR をそのまま渡す（改行等を含みうるためエンコードする）
+    for name in ('SCRIPT_NAME', 'PATH_INFO', 'REMOTE_ADDR'):
+        headers['X-Cgi-' + name.title().replace('_', '-')] = quote(environ.get(name, '').encode('latin-1'), safe='/')
+    headers['X-Cgi-Url-Scheme'] = scheme
+    headers['Connection'] = 'close'
+
+    length = int(environ.get('CONTENT_LENGTH') or 0)
+    body = sys.stdin.buffer.read(length) if length else None
+    path = environ.get('REQUEST_URI') or (
+        quote(environ.get('PATH_INFO', '/').encode('latin-1'), safe='/')
+        + ('?' + environ['QUERY_STRING'] if environ.get('QUERY_STRING') else '')
+    )
+
+    connection.request(environ.get('REQUEST_METHOD', 'GET'), path, body=body, headers=headers)
+    response = connection.getresponse()
+
+    out = sys.stdout.buffer
+    out.write(f'Status: {response.status} {response.reason}\r\n'.encode('latin-1'))
+    for name, value in response.getheaders():
+        if name.lower() not in ('connection', 'keep-alive', 'transfer-encoding'):
+            out.write(f'{name}: {value}\r\n'.encode('latin-1'))
+    out.write(b'\r\n')
+    while True:
+        chunk = response.read(65536)
+        if not chunk:
+            break
+        out.write(chunk)
+    out.flush()
+    return True
+
+
+# 常駐サーバーが起動していれば転送して終了する（Djangoは読み込まない）
+if __name__ == '__main__' and os.path.exists(app_socket) and forward_to_app_server(app_socket):
+    sys.exit(0)
+
+# 1リクエストで終了するプロセスのため、PDFはプロセスプールを作らずにこのプロセス内でレンダリングする
+os.environ['SHIFT_PDF_POOL'] = '0'
+
 # Django設定
 import django
 from django.conf import settings
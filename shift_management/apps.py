@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class ShiftManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'shift_management' 
\ No newline at end of file
+    name = 'shift_management'
+
+    def ready(self):
+        # シグナルハンドラを登録
+        from . import signals  # noqa: F401
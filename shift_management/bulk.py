@@ -0,0 +1,226 @@
+"""
+シフトの一括操作エンジン
+
+1件ずつ get()/save() を繰り返さず、対象行をまとめて読み込み、
+1トランザクション内で一括更新する。bulk_create/bulk_update はシグナルを
+送らないため、イベントキャッシュの無効化は deferred_shift_changes() に
+変更日を登録して行う。
+"""
+
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+
+from .models import Shift
+from .schedule import iter_dates
+from .signals import deferred_shift_changes
+
+SHIFT_NOT_FOUND = '指定されたシフトが見つかりません'
+
+# 一括削除・一括挿入の1文あたりの件数
+BATCH_SIZE = 500
+
+
+def _parse_move(change):
+    """移動・リサイズ指示1件を (date, start_time, end_time) に変換（不正なら ValueError）"""
+    new_date = change.get('new_date')
+    new_start_time = change.get('new_start_time')
+    new_end_time = change.get('new_end_time')
+    if not all([new_date, new_start_time, new_end_time]):
+        raise ValueError('必要なパラメータが不足しています')
+
+    try:
+        date = datetime.datetime.strptime(str(new_date), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('日付形式が正しくありません')
+    try:
+        start_time = parse_time(str(new_start_time))
+        end_time = parse_time(str(new_end_time))
+    except ValueError:
+        start_time = end_time = None
+    if not start_time or not end_time:
+        raise ValueError('時間形式が正しくありません')
+    # 終了が開始以前の場合は日をまたぐシフト（22:00〜06:00、00:00終了など）として受け付ける
+    return date, start_time, end_time
+
+
+def move_shifts(changes):
+    """シフトの移動・リサイズを一括適用する
+
+    changes: [{'shift_id', 'new_date', 'new_start_time', 'new_end_time'}, ...]
+    対象シフトは1クエリで取得し、検証を通ったものだけを1トランザクション・
+    1回の bulk_update で更新する。戻り値は入力順の結果リスト。
+    """
+    ids = []
+    for change in changes:
+        try:
+            ids.append(int(change.get('shift_id')))
+        except (TypeError, ValueError):
+            pass
+    shifts = Shift.objects.in_bulk(ids)
+
+    now = timezone.now()
+    results = []
+    to_update = {}
+    touched_dates = []
+    for change in changes:
+        shift_id = change.get('shift_id')
+        try:
+            shift = shifts.get(int(shift_id))
+        except (TypeError, ValueError):
+            shift = None
+        if shift is None:
+            results.append({'shift_id': shift_id, 'success': False, 'error': SHIFT_NOT_FOUND})
+            continue
+        try:
+            date, start_time, end_time = _parse_move(change)
+        except ValueError as e:
+            results.append({'shift_id': shift.id, 'success': False, 'error': str(e)})
+            continue
+
+        touched_dates.extend([shift.date, date])
+        shift.date = date
+        shift.start_time = start_time
+        shift.end_time = end_time
+        shift.updated_at = now  # bulk_update では auto_now が効かないため明示
+        to_update[shift.id] = shift
+        results.append({
+            'shift_id': shift.id,
+            'success': True,
+            'date': date.isoformat(),
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+        })
+
+    if to_update:
+        with transaction.atomic(), deferred_shift_changes() as batch:
+            Shift.objects.bulk_update(
+                list(to_update.values()), ['date', 'start_time', 'end_time', 'updated_at']
+            )
+            batch.touch(touched_dates)
+    return results
+
+
+def diff_shift_plan(plan, overwrite=False, lock=False):
+    """(スタッフ, 日付) ごとの新規シフト計画を既存シフトと突き合わせる
+
+    plan: 未保存の Shift インスタンスのリスト（(staff_id, date) は重複しない前提）
+    既存シフトは計画の期間・スタッフで1回の範囲クエリにまとめて取得する。
+    lock なら select_for_update で取得する（トランザクション内で使う。MySQL では範囲への
+    同時の挿入も待たせる。SQLite はもともと書き込みを直列化するため無視される）。
+    戻り値: {'inserts': [...], 'overwrites': [...], 'skips': [...], 'delete_ids': [...]}
+    inserts/overwrites/skips は plan の要素、delete_ids は上書きで削除する既存シフトのID。
+    """
+    diff = {'inserts': [], 'overwrites': [], 'skips': [], 'delete_ids': []}
+    if not plan:
+        return diff
+
+    staff_ids = {shift.staff_id for shift in plan}
+    dates = [shift.date for shift in plan]
+    shifts = Shift.objects.filter(staff_id__in=staff_ids, date__range=[min(dates), max(dates)]).order_by()
+    if lock:
+        shifts = shifts.select_for_update()
+    existing = defaultdict(list)
+    for shift_id, staff_id, date in shifts.values_list('id', 'staff_id', 'date'):
+        existing[(staff_id, date)].append(shift_id)
+
+    for shift in plan:
+        conflict_ids = existing.get((shift.staff_id, shift.date))
+        if not conflict_ids:
+            diff['inserts'].append(shift)
+        elif overwrite:
+            diff['overwrites'].append(shift)
+            diff['delete_ids'].extend(conflict_ids)
+        else:
+            diff['skips'].append(shift)
+    return diff
+
+
+def _delete_shifts(batch, ids):
+    """シフトを1文で削除する
+
+    delete() は post_delete の受信側があると1行ずつ読み込んでシグナルを送るため、
+    削除記録に必要な (ID, 日付) だけを取得して _raw_delete で消す
+    （Shift を参照する外部キーはないため連鎖削除は不要）。
+    """
+    shifts = Shift.objects.filter(pk__in=ids).order_by()
+    batch.record_deletions(shifts.values_list('id', 'date'))
+    shifts._raw_delete(shifts.db)
+
+
+def _plan_result(diff):
+    return {
+        'created': len(diff['inserts']) + len(diff['overwrites']),
+        'skipped': len(diff['skips']),
+        'overwritten': len(diff['overwrites']),
+        'diff': diff,
+    }
+
+
+def apply_shift_plan(plan, overwrite=False, dry_run=False):
+    """(スタッフ, 日付) ごとの新規シフト計画を一括で反映する
+
+    既存シフトの取得（ロック付き）、上書き対象の削除（BATCH_SIZE 件ごとに1文）、
+    新規分の bulk_create をすべて1つのトランザクション内で行い、
+    途中で同じ (スタッフ, 日付) に挿入されて重複することを防ぐ。dry_run なら何も書き込まない。
+    戻り値: {'created', 'skipped', 'overwritten', 'diff'}（diff は diff_shift_plan の結果）
+    """
+    if dry_run or not plan:
+        return _plan_result(diff_shift_plan(plan, overwrite))
+
+    with transaction.atomic(), deferred_shift_changes() as batch:
+        diff = diff_shift_plan(plan, overwrite, lock=True)
+        to_create = diff['inserts'] + diff['overwrites']
+        delete_ids = diff['delete_ids']
+        for i in range(0, len(delete_ids), BATCH_SIZE):
+            _delete_shifts(batch, delete_ids[i:i + BATCH_SIZE])
+        if to_create:
+            Shift.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+            batch.touch(shift.date for shift in to_create)
+    return _plan_result(diff)
+
+
+def build_bulk_plan(staff_list, shift_type, start_date, end_date, weekdays, start_time, end_time):
+    """一括登録フォームの条件から (スタッフ, 日付) ごとの未保存 Shift のリストを作る
+
+    weekdays は選択された曜日（'0'〜'6' の文字列）。
+    """
+    staff_list = list(staff_list)
+    return [
+        Shift(
+            staff=staff,
+            shift_type=shift_type,
+            date=date,
+            start_time=start_time,
+            end_time=end_time,
+        )
+        for date in iter_dates(start_date, end_date)
+        if str(date.weekday()) in weekdays
+        for staff in staff_list
+    ]
+
+
+def expand_template(template, start_date, end_date):
+    """シフトテンプレートを期間に展開し、未保存の Shift のリストを返す
+
+    テンプレート詳細は1クエリで取得して曜日ごとにまとめておき、
+    日付を1パスで走査する。
+    """
+    by_weekday = defaultdict(list)
+    for detail in template.details.select_related('staff', 'shift_type'):
+        by_weekday[detail.weekday].append(detail)
+
+    return [
+        Shift(
+            staff=detail.staff,
+            shift_type=detail.shift_type,
+            date=date,
+            start_time=detail.start_time,
+            end_time=detail.end_time,
+        )
+        for date in iter_dates(start_date, end_date)
+        for detail in by_weekday.get(date.weekday(), ())
+    ]
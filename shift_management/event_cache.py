@@ -0,0 +1,201 @@
+"""
+api_shifts 用イベントJSONの月単位キャッシュ
+
+Djangoのキャッシュフレームワーク（本番は FileBasedCache）に、
+月ごとの「日付 → イベントJSON断片」を保存する。複数月にまたがる
+リクエストは月ごとのエントリを連結して応答する。
+
+エントリの無効化は signals.py のハンドラから、トランザクションのコミット後に invalidate_months() で行う。
+無効化は月ごとの世代（期限なしのキー）を新しい値にすることで行い、エントリは構築前に読んだ世代を持つ。
+世代が変わっていればエントリは使わないため、構築中にコミットされた変更を含まないエントリが
+保存されても、古いまま使われることはない。
+各エントリは構築時に採番したトークンを持ち、ETag はトークンから算出するため、
+キャッシュが温まっていればデータベースにアクセスせずに304/200を返せる。
+"""
+
+import datetime
+import hashlib
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.dateparse import parse_date
+
+from . import metrics
+from .events import EVENTS_FORMAT_VERSION, cursor_margin, encode_events, event_rows, make_cursor, row_to_event
+
+KEY_PREFIX = 'shift_events'
+# event_cache_stats --reset の時点の件数（表示用。Prometheus のカウンタは減らさない）
+BASELINE_KEY = f'{KEY_PREFIX}:stats:baseline'
+
+
+def _timeout():
+    # シグナルを経由しない更新への保険として既定1日で失効させる
+    return getattr(settings, 'SHIFT_EVENTS_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def month_key(year, month):
+    return f'{KEY_PREFIX}:v{EVENTS_FORMAT_VERSION}:month:{year:04d}-{month:02d}'
+
+
+def generation_key(year, month):
+    return f'{KEY_PREFIX}:generation:{year:04d}-{month:02d}'
+
+
+def month_start(date):
+    return date.replace(day=1)
+
+
+def next_month(date):
+    """date の属する月の翌月1日"""
+    if date.month == 12:
+        return datetime.date(date.year + 1, 1, 1)
+    return datetime.date(date.year, date.month + 1, 1)
+
+
+def iter_months(start_date, end_date):
+    """期間にかかる各月の1日を順に返す"""
+    current = month_start(start_date)
+    while current <= end_date:
+        yield current
+        current = next_month(current)
+
+
+def _generations(months, found):
+    """各月の世代（found は get_many の結果。なければ作成する）"""
+    keys = {m: generation_key(m.year, m.month) for m in months}
+    absent = [key for key in keys.values() if key not in found]
+    if absent:
+        for key in absent:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+        # 同時に作成された場合は先に作成された値を使う
+        found = {**found, **cache.get_many(absent)}
+    return {m: found.get(key) for m, key in keys.items()}
+
+
+def _build_months(months, generations):
+    """未キャッシュの月をまとめて1クエリで構築し、{key: entry} を返す
+
+    generations はクエリ発行前に読んだ各月の世代。
+    """
+    first = months[0]
+    last = next_month(months[-1]) - datetime.timedelta(days=1)
+    wanted = {(m.year, m.month) for m in months}
+    # 差分同期カーソルの基準になるため、クエリ発行前の時刻を構築時刻とする
+    built_at = time.time()
+
+    by_day = defaultdict(list)
+    for row in event_rows(first, last).order_by('date', 'start_time'):
+        date = row[1]
+        if (date.year, date.month) in wanted:
+            by_day[date].append(row_to_event(row))
+
+    entries = {
+        m: {'token': uuid.uuid4().hex, 'generation': generations[m], 'built': built_at, 'days': {}}
+        for m in months
+    }
+    for date, events in by_day.items():
+        # 配列の角括弧を除いた断片で保存し、応答時は連結するだけにする
+        entries[month_start(date)]['days'][date.isoformat()] = encode_events(events)[1:-1]
+    return {month_key(m.year, m.month): entries[m] for m in months}
+
+
+class CachedRange:
+    """期間にかかる月エントリの集合（ETag算出と本文の連結を担う）"""
+
+    def __init__(self, start_date, end_date, entries):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.entries = entries  # 月順の entry リスト
+
+    @property
+    def etag(self):
+        token = ':'.join([self.start_date.isoformat(), self.end_date.isoformat()]
+                         + [entry['token'] for entry in self.entries])
+        return '"%s"' % hashlib.md5(token.encode()).hexdigest()
+
+    @property
+    def last_modified(self):
+        """各月エントリの構築時刻の最大値（UNIXタイムスタンプ）"""
+        return int(max(entry['built'] for entry in self.entries))
+
+    @property
+    def cursor(self):
+        """差分同期の起点（最も古いエントリの構築時刻を cursor_margin() だけ巻き戻す）"""
+        return make_cursor(min(entry['built'] for entry in self.entries) - cursor_margin().total_seconds())
+
+    def payload(self):
+        """期間内のイベント配列JSON"""
+        start_str = self.start_date.isoformat()
+        end_str = self.end_date.isoformat()
+        fragments = []
+        for entry in self.entries:
+            days = entry['days']
+            for date_str in sorted(days):
+                if start_str <= date_str <= end_str:
+                    fragments.append(days[date_str])
+        return '[' + ','.join(fragments) + ']'
+
+
+def load_range(start_date, end_date):
+    """期間にかかる月エントリを取得し、未キャッシュの月は構築して保存する"""
+    months = list(iter_months(start_date, end_date))
+    keys = [month_key(m.year, m.month) for m in months]
+    found = cache.get_many(keys + [generation_key(m.year, m.month) for m in months])
+    generations = _generations(months, found)
+
+    # 構築後に無効化された（世代が変わった）エントリは未キャッシュとして扱う
+    missing = [
+        m for m, key in zip(months, keys)
+        if key not in found or found[key].get('generation') != generations[m]
+    ]
+    if missing:
+        built = _build_months(missing, generations)
+        cache.set_many(built, timeout=_timeout())
+        found.update(built)
+    metrics.inc('shift_event_cache_hits_total', len(months) - len(missing))
+    metrics.inc('shift_event_cache_misses_total', len(missing))
+
+    return CachedRange(start_date, end_date, [found[key] for key in keys])
+
+
+def invalidate_months(dates):
+    """指定日付の属する月の世代を更新し、エントリを削除する"""
+    months = set()
+    for date in dates:
+        if isinstance(date, str):
+            date = parse_date(date)
+        if date:
+            months.add((date.year, date.month))
+    if months:
+        cache.set_many({generation_key(*m): uuid.uuid4().hex for m in months}, timeout=None)
+        cache.delete_many([month_key(*m) for m in months])
+
+
+def _counts():
+    totals = metrics.collect()
+    return (metrics.counter_value(totals, 'shift_event_cache_hits_total'),
+            metrics.counter_value(totals, 'shift_event_cache_misses_total'))
+
+
+def cache_stats():
+    """reset_stats() 以降のヒット・ミス件数とヒット率（metrics のカウンタから算出する）"""
+    hits, misses = _counts()
+    base_hits, base_misses = cache.get(BASELINE_KEY, (0, 0))
+    # カウンタがリセットされていれば（metrics のファイルを削除した等）基準も捨てる
+    if hits < base_hits or misses < base_misses:
+        base_hits = base_misses = 0
+    hits -= base_hits
+    misses -= base_misses
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def reset_stats():
+    cache.set(BASELINE_KEY, _counts(), timeout=None)
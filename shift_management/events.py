@@ -0,0 +1,146 @@
+"""
+FullCalendar用イベントJSONのシリアライザ
+
+モデルインスタンスを生成せず、必要な列だけを values_list で取得して
+1パスでJSON文字列を組み立てる（api_shifts の高速パス）。
+"""
+
+import datetime
+import json
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Shift, ShiftTombstone
+
+# 事由コード → 表示名（get_deletion_reason_display() を行ごとに呼ばないための事前計算）
+REASON_LABELS = dict(Shift.DELETION_REASON_CHOICES)
+
+# イベント生成に必要な列（この順序で values_list から受け取る）
+EVENT_COLUMNS = (
+    'id',
+    'date',
+    'start_time',
+    'end_time',
+    'is_deleted_with_reason',
+    'deletion_reason',
+    'staff_id',
+    'staff__name',
+    'shift_type_id',
+    'shift_type__name',
+    'shift_type__color',
+)
+
+REASON_COLOR = '#6c757d'  # 事由付きはグレー
+DEFAULT_COLOR = '#3498db'
+
+# イベントJSONの形式を変えたら上げる（キャッシュとETagを一斉に無効化するため）
+EVENTS_FORMAT_VERSION = 1
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def event_rows(start_date, end_date):
+    """期間内のシフトをイベント用の列タプルで取得するクエリセット"""
+    return Shift.objects.filter(
+        date__range=[start_date, end_date]
+    ).values_list(*EVENT_COLUMNS)
+
+
+def row_to_event(row):
+    """列タプル1件をFullCalendarのイベントdictに変換"""
+    (shift_id, date, start_time, end_time, is_reason, reason,
+     staff_id, staff_name, shift_type_id, shift_type_name, shift_type_color) = row
+    date_str = date.isoformat()
+
+    if is_reason or start_time is None or end_time is None:
+        if is_reason:
+            label = REASON_LABELS.get(reason, reason)
+        else:
+            label = shift_type_name or '未設定'
+        # 事由付き（または時間未設定）は終日イベントとして表示
+        return {
+            'id': shift_id,
+            'title': f'{staff_name} ({label})',
+            'start': date_str,
+            'allDay': True,
+            'color': REASON_COLOR if is_reason else (shift_type_color or DEFAULT_COLOR),
+            'textColor': '#ffffff',
+            'staff_id': staff_id,
+            'shift_type_id': None if is_reason else shift_type_id,
+            'is_reason': bool(is_reason),
+            'reason': reason,
+        }
+
+    return {
+        'id': shift_id,
+        'title': f'{staff_name} ({shift_type_name or "未設定"})',
+        'start': f'{date_str}T{start_time.isoformat()}',
+        'end': f'{date_str}T{end_time.isoformat()}',
+        'color': shift_type_color or DEFAULT_COLOR,
+        'staff_id': staff_id,
+        'shift_type_id': shift_type_id,
+        'is_reason': False,
+    }
+
+
+def encode_events(events):
+    """イベント（dictのリスト、または差分のdict）をJSON文字列にする"""
+    return _encoder.encode(events)
+
+
+def render_events_json(rows):
+    """列タプルのイテラブルからイベント配列のJSON文字列を生成"""
+    return encode_events([row_to_event(row) for row in rows])
+
+
+
+def tombstone_retention():
+    """削除記録の保持期間（これより古いカーソルは全件再取得させる）"""
+    return datetime.timedelta(days=getattr(settings, 'SHIFT_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def cursor_margin():
+    """カーソルを巻き戻す幅（最も長い書き込みトランザクションより長くする）
+
+    updated_at・deleted_at はコミット時ではなく保存時の時刻のため、読み取り時点で
+    未コミットだった変更は、カーソルより前の時刻でコミットされうる。
+    """
+    return datetime.timedelta(seconds=getattr(settings, 'SHIFT_SYNC_CURSOR_MARGIN_SECONDS', 60))
+
+
+def make_cursor(moment):
+    """datetime または UNIXタイムスタンプから同期カーソル文字列を作る"""
+    if isinstance(moment, datetime.datetime):
+        moment = moment.timestamp()
+    return f'{moment:.6f}'
+
+
+def parse_cursor(cursor):
+    """同期カーソルを aware な datetime に戻す（不正な値は ValueError）"""
+    return datetime.datetime.fromtimestamp(float(cursor), tz=datetime.timezone.utc)
+
+
+def changes_since(start_date, end_date, since):
+    """since 以降に追加・更新・削除されたイベントの差分
+
+    戻り値: {'cursor', 'events', 'removed'} または保持期間切れなら {'reset': True}
+    返すカーソルは cursor_margin() だけ巻き戻すため、同じイベントが再送されうる
+    （クライアント側でIDにより重複を除く）。
+    """
+    now = timezone.now()
+    if since < now - tombstone_retention():
+        return {'reset': True, 'cursor': make_cursor(now - cursor_margin())}
+
+    events = []
+    removed = []
+    # 更新されたシフトは updated_at のインデックスで1回で取得し、期間で振り分ける
+    # （期間外へ移動したシフトと削除済みシフトはクライアント側から取り除かせる）
+    for row in Shift.objects.filter(updated_at__gte=since).order_by().values_list(*EVENT_COLUMNS):
+        if start_date <= row[1] <= end_date:
+            events.append(row_to_event(row))
+        else:
+            removed.append(row[0])
+    removed += ShiftTombstone.objects.filter(deleted_at__gte=since).values_list('shift_id', flat=True)
+
+    return {'cursor': make_cursor(now - cursor_margin()), 'events': events, 'removed': removed}
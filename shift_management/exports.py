@@ -0,0 +1,211 @@
+"""
+シフト表のエクスポート（CSV・PDF）
+"""
+
+import csv
+
+from django.db.models import Case, IntegerField, Value, When
+from django.template.loader import render_to_string
+
+from . import metrics, pdf_cache, pdf_render, pdf_worker, timing
+from .events import DEFAULT_COLOR, REASON_COLOR, REASON_LABELS
+from .models import Shift
+from .schedule import ScheduleMatrix, iter_dates
+
+WEEKDAY_LABELS = ["月", "火", "水", "木", "金", "土", "日"]
+
+PDF_TEMPLATE = 'shift_management/shift_pdf_template.html'
+
+PDF_STYLESHEET = '''
+    @page {
+        size: A4 landscape;
+        margin: 1cm;
+    }
+    body {
+        font-family: sans-serif;
+    }
+    table {
+        width: 100%;
+        border-collapse: collapse;
+    }
+    th, td {
+        border: 1px solid #ddd;
+        padding: 4px;
+        text-align: center;
+        font-size: 12px;
+    }
+    th {
+        background-color: #f2f2f2;
+    }
+    .shift-entry {
+        margin-bottom: 2px;
+        padding: 2px;
+        border-radius: 3px;
+    }
+'''
+
+
+class _Echo:
+    """csv.writer の書き込み先（書かれた文字列をそのまま返す）"""
+
+    def write(self, value):
+        return value
+
+
+def _shift_text(shift_type_name, start_time, end_time, is_reason, reason):
+    if is_reason:
+        return REASON_LABELS.get(reason, reason or '')
+    if start_time is None or end_time is None:
+        return shift_type_name or "未設定"
+    return f'{shift_type_name or "未設定"} {start_time.strftime("%H:%M")}-{end_time.strftime("%H:%M")}'
+
+
+def iter_shift_csv(staff_list, start_date, end_date):
+    """スタッフ×日付のシフト表をCSVの行単位で順に生成する
+
+    スタッフの一覧を先に取得し、シフトはその並び順で (スタッフ, 日付) 順に
+    .iterator() で読み進め、スタッフ1人分がそろった時点で1行を出力する。
+    期間が長くてもメモリに載るシフトは1行分だけ。
+    """
+    writer = csv.writer(_Echo())
+    dates = list(iter_dates(start_date, end_date))
+
+    yield '\ufeff'  # BOMを追加してExcelでの文字化け対策
+
+    # ヘッダー行
+    header = ['スタッフ名']
+    for date in dates:
+        header.append(f'{date.strftime("%Y/%m/%d")}({WEEKDAY_LABELS[date.weekday()]})')
+    yield writer.writerow(header)
+
+    staff_rows = list(staff_list.order_by('name', 'id').values_list('id', 'name'))
+    if not staff_rows:
+        return
+    # シフトは取得済みのスタッフの並び順（ID）で並べる。名前で並べ直すと、2つのクエリの間に
+    # スタッフ名が変わった場合に突き合わせがずれ、以降のスタッフが空行になるため
+    staff_order = Case(
+        *[When(staff_id=staff_id, then=Value(index)) for index, (staff_id, _) in enumerate(staff_rows)],
+        output_field=IntegerField(),
+    )
+    shifts = Shift.objects.filter(
+        date__range=[start_date, end_date],
+        staff_id__in=[staff_id for staff_id, _ in staff_rows],
+    ).order_by(staff_order, 'date', 'start_time').values_list(
+        'staff_id', 'date', 'shift_type__name', 'start_time', 'end_time',
+        'is_deleted_with_reason', 'deletion_reason',
+    ).iterator(chunk_size=2000)
+
+    pending = next(shifts, None)
+    for staff_id, staff_name in staff_rows:
+        cells = {}
+        while pending is not None and pending[0] == staff_id:
+            _, date, *rest = pending
+            cells.setdefault(date, []).append(_shift_text(*rest))
+            pending = next(shifts, None)
+        yield writer.writerow([staff_name] + ['\n'.join(cells.get(date, ())) for date in dates])
+
+
+def _pdf_entry(shift):
+    """PDFのセルに表示するシフト1件分の表示用データ"""
+    if shift.is_deleted_with_reason:
+        return {
+            'label': REASON_LABELS.get(shift.deletion_reason, shift.deletion_reason or ''),
+            'time': '',
+            'color': REASON_COLOR,
+        }
+    shift_type = shift.shift_type
+    time_text = ''
+    if shift.start_time and shift.end_time:
+        time_text = f'{shift.start_time.strftime("%H:%M")}-{shift.end_time.strftime("%H:%M")}'
+    return {
+        'label': shift_type.name if shift_type else "未設定",
+        'time': time_text,
+        'color': shift_type.color if shift_type else DEFAULT_COLOR,
+    }
+
+
+def build_pdf_context(staff_list, start_date, end_date):
+    """PDFテンプレート用に、行（スタッフ）×セル（日付）の表をO(n)で組み立てる
+
+    テンプレート側ではセルごとに全シフトを走査せず、
+    ここで用意した行・セルを順に出力するだけにする。
+    """
+    shifts = Shift.objects.filter(
+        date__range=[start_date, end_date],
+        staff__in=staff_list
+    ).select_related('shift_type').order_by('date', 'start_time')
+    matrix = ScheduleMatrix(shifts, start_date, end_date, staff_list)
+
+    columns = [
+        {'date': date, 'weekday_label': WEEKDAY_LABELS[date.weekday()], 'weekend': date.weekday() >= 5}
+        for date in matrix.dates
+    ]
+    rows = []
+    for row in matrix.rows():
+        rows.append({
+            'staff': row['staff'],
+            'cells': [
+                {'weekend': column['weekend'], 'entries': [_pdf_entry(shift) for shift in cell]}
+                for column, cell in zip(columns, row['cells'])
+            ],
+        })
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'columns': columns,
+        'rows': rows,
+    }
+
+
+def render_pdf_html(context):
+    """PDF用HTMLをレンダリング"""
+    return render_to_string(PDF_TEMPLATE, context)
+
+
+def html_to_pdf(html_string):
+    """WeasyPrintでHTMLをPDF（bytes）に変換（呼び出し元のプロセスで実行）"""
+    with timing.phase('pdf'):
+        return pdf_worker.render_pdf(html_string, PDF_STYLESHEET)
+
+
+def render_shift_pdf(staff_list, start_date, end_date):
+    """シフト表PDFをレンダリング用プロセスで生成する
+
+    複数月にまたがる場合は月ごとに分けて並列にレンダリングし、連結する
+    （pypdf がなければ期間全体を1件としてレンダリングする）。
+    レンダリングに失敗した場合は pdf_render.PdfRenderError を送出する。
+    """
+    if pdf_render.can_merge():
+        ranges = pdf_render.split_by_month(start_date, end_date)
+    else:
+        ranges = [(start_date, end_date)]
+    html_parts = [
+        render_pdf_html(build_pdf_context(staff_list, part_start, part_end))
+        for part_start, part_end in ranges
+    ]
+    with timing.phase('pdf'):
+        return pdf_render.render_parts(html_parts, PDF_STYLESHEET)
+
+
+def open_shift_pdf(staff_list, start_date, end_date):
+    """シフト表PDFを開いたファイルオブジェクトで返す
+
+    同じ内容のPDFがキャッシュにあればそれを返し、なければ生成して保存する。
+    生成に失敗した場合は pdf_render.PdfRenderError を送出する。
+    """
+    key = pdf_cache.export_key(staff_list, start_date, end_date, PDF_TEMPLATE, PDF_STYLESHEET)
+    path = pdf_cache.get(key)
+    if path is not None:
+        try:
+            pdf_file = open(path, 'rb')
+        except FileNotFoundError:
+            # 取得直後に他のリクエストが削除した場合は作り直す
+            pass
+        else:
+            metrics.inc('shift_pdf_cache_hits_total')
+            return pdf_file
+
+    metrics.inc('shift_pdf_cache_misses_total')
+    pdf_file = render_shift_pdf(staff_list, start_date, end_date)
+    return open(pdf_cache.put(key, pdf_file), 'rb')
@@ -133,21 +133,9 @@ class ShiftReasonForm(forms.ModelForm):
     def save(self, commit=True):
         instance = super().save(commit=False)
         
-        # 同じスタッフ・同じ日付の既存シフトを削除
+        # 同じスタッフ・同じ日付の既存シフト（通常・事由付きとも）を削除（重複防止）
         if commit:
-            # 既存の通常シフト（事由なし）を削除
-            Shift.objects.filter(
-                staff=instance.staff,
-                date=instance.date,
-                is_deleted_with_reason=False
-            ).delete()
-            
-            # 既存の事由付きシフトも削除（重複防止）
-            Shift.objects.filter(
-                staff=instance.staff,
-                date=instance.date,
-                is_deleted_with_reason=True
-            ).delete()
+            Shift.objects.filter(staff=instance.staff, date=instance.date).delete()
         
         # 事由登録の場合は特別な値を設定
         instance.is_deleted_with_reason = True
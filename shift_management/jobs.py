@@ -0,0 +1,151 @@
+"""
+一括処理ジョブの登録と実行
+
+時間のかかる一括登録・テンプレート適用を ShiftJob として登録し、
+管理コマンド run_shift_jobs のワーカープロセスが実行する。
+外部のメッセージブローカーは使わず、ジョブの受け渡しはデータベースのみで行う。
+
+進捗を他プロセスから見えるようにするため、計画は月単位に分割し、
+月ごとにトランザクションを確定させてから進捗を更新する。
+"""
+
+import datetime
+import traceback
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+from . import metrics
+from .bulk import apply_shift_plan, build_bulk_plan, expand_template
+from .models import ShiftJob, ShiftTemplate, ShiftType, Staff
+
+
+def job_threshold():
+    """この件数を超える一括処理はジョブとしてバックグラウンドで実行する"""
+    return getattr(settings, 'SHIFT_JOB_THRESHOLD', 3000)
+
+
+def enqueue(kind, params):
+    """ジョブを登録する（params はJSONに変換できる値のみ）"""
+    return ShiftJob.objects.create(kind=kind, params=params)
+
+
+def stale_timeout():
+    """実行中のまま、開始からこの時間を過ぎたジョブはワーカーが停止したものとみなす"""
+    return datetime.timedelta(seconds=getattr(settings, 'SHIFT_JOB_STALE_SECONDS', 60 * 60))
+
+
+def fail_stale_jobs(job=None):
+    """停止したワーカーの実行中ジョブを失敗にする（job を指定すればそのジョブだけ）
+
+    確定済みの月の件数は result に残る。戻り値: 失敗にした件数
+    """
+    cutoff = timezone.now() - stale_timeout()
+    if job is not None and not (job.status == 'running' and job.started_at and job.started_at < cutoff):
+        # 進捗画面のポーリングのたびにクエリを発行しないよう、手元の値で判定する
+        return 0
+    stale = ShiftJob.objects.filter(status='running', started_at__lt=cutoff)
+    if job is not None:
+        stale = stale.filter(pk=job.pk)
+    updated = stale.update(
+        status='failed', finished_at=timezone.now(),
+        error='ワーカーが応答しないため中断しました（処理済みの月は登録されています）',
+    )
+    if job is not None and updated:
+        job.refresh_from_db()
+    return updated
+
+
+def claim_next():
+    """待機中のジョブを1件確保して実行中にする（他のワーカーと競合しない）"""
+    pending = ShiftJob.objects.filter(status='pending').order_by('created_at')
+    for job_id in pending.values_list('id', flat=True)[:10]:
+        claimed = ShiftJob.objects.filter(pk=job_id, status='pending').update(
+            status='running', started_at=timezone.now()
+        )
+        if claimed:
+            return ShiftJob.objects.get(pk=job_id)
+    return None
+
+
+def _plan_bulk_shift_create(params):
+    return build_bulk_plan(
+        Staff.objects.filter(pk__in=params['staff_ids']),
+        ShiftType.objects.get(pk=params['shift_type_id']),
+        parse_date(params['start_date']),
+        parse_date(params['end_date']),
+        params['weekdays'],
+        parse_time(params['start_time']),
+        parse_time(params['end_time']),
+    )
+
+
+def _plan_template_apply(params):
+    return expand_template(
+        ShiftTemplate.objects.get(pk=params['template_id']),
+        parse_date(params['start_date']),
+        parse_date(params['end_date']),
+    )
+
+
+# 処理種別ごとの計画作成関数
+PLANNERS = {
+    'bulk_shift_create': _plan_bulk_shift_create,
+    'template_apply': _plan_template_apply,
+}
+
+
+def _split_by_month(plan):
+    chunks = defaultdict(list)
+    for shift in plan:
+        chunks[(shift.date.year, shift.date.month)].append(shift)
+    return [chunks[key] for key in sorted(chunks)]
+
+
+def run_job(job):
+    """確保済みのジョブを実行し、進捗と結果を記録する"""
+    totals = {'created': 0, 'skipped': 0, 'overwritten': 0}
+    try:
+        plan = PLANNERS[job.kind](job.params)
+        ShiftJob.objects.filter(pk=job.pk).update(progress_total=len(plan))
+
+        done = 0
+        for chunk in _split_by_month(plan):
+            result = apply_shift_plan(chunk, overwrite=job.params.get('overwrite', False))
+            for key in totals:
+                totals[key] += result[key]
+            done += len(chunk)
+            ShiftJob.objects.filter(pk=job.pk).update(progress_done=done, result=totals)
+
+        ShiftJob.objects.filter(pk=job.pk).update(
+            status='succeeded', result=totals, finished_at=timezone.now()
+        )
+    except Exception:
+        # 確定済みの月の件数は result に残る
+        ShiftJob.objects.filter(pk=job.pk).update(
+            status='failed', result=totals, error=traceback.format_exc(),
+            finished_at=timezone.now()
+        )
+    # 失敗した場合も確定済みの月の件数を記録する
+    metrics.record_shift_plan(job.kind, totals['created'])
+    job.refresh_from_db()
+    return job
+
+
+def job_payload(job):
+    """ステータスAPI用のdict"""
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'kind_display': job.get_kind_display(),
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress_done': job.progress_done,
+        'progress_total': job.progress_total,
+        'progress_percent': job.progress_percent,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+    }
+
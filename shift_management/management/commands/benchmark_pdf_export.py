@@ -0,0 +1,56 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shift_management.exports import build_pdf_context, html_to_pdf, render_pdf_html
+from shift_management.models import Staff
+
+
+class Command(BaseCommand):
+    help = 'PDFエクスポートの処理時間を、データ準備・HTMLレンダリング・PDFレイアウトに分けて計測します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='開始日（YYYY-MM-DD）')
+        parser.add_argument('--end', required=True, help='終了日（YYYY-MM-DD）')
+        parser.add_argument('--staff', type=int, nargs='*', help='対象スタッフID（省略時は有効な全スタッフ）')
+        parser.add_argument('--repeat', type=int, default=3, help='計測回数（既定: 3回）')
+        parser.add_argument('--skip-pdf', action='store_true', help='PDFレイアウトを計測しない（HTMLのみ）')
+
+    def handle(self, *args, **options):
+        try:
+            start_date = datetime.date.fromisoformat(options['start'])
+            end_date = datetime.date.fromisoformat(options['end'])
+        except ValueError:
+            raise CommandError('日付は YYYY-MM-DD 形式で指定してください')
+
+        staff_list = Staff.objects.filter(is_active=True)
+        if options['staff']:
+            staff_list = Staff.objects.filter(pk__in=options['staff'])
+
+        timings = {'context': [], 'html': [], 'pdf': []}
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            context = build_pdf_context(staff_list, start_date, end_date)
+            timings['context'].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            html_string = render_pdf_html(context)
+            timings['html'].append(time.perf_counter() - started)
+
+            if not options['skip_pdf']:
+                started = time.perf_counter()
+                pdf_file = html_to_pdf(html_string)
+                timings['pdf'].append(time.perf_counter() - started)
+
+        cells = sum(len(row['cells']) for row in context['rows'])
+        self.stdout.write(f'期間: {start_date} 〜 {end_date} / スタッフ {len(context["rows"])}名 / セル {cells}個')
+        self.stdout.write(f'HTMLサイズ: {len(html_string):,} 文字')
+        if not options['skip_pdf']:
+            self.stdout.write(f'PDFサイズ: {len(pdf_file):,} バイト')
+        labels = {'context': 'データ準備', 'html': 'HTMLレンダリング', 'pdf': 'PDFレイアウト'}
+        for key, values in timings.items():
+            if values:
+                self.stdout.write(
+                    f'{labels[key]}: 最小 {min(values) * 1000:.1f}ms / 平均 {sum(values) / len(values) * 1000:.1f}ms'
+                )
@@ -0,0 +1,217 @@
+import datetime
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shift_management.models import Shift, ShiftTemplate, ShiftType, Staff
+
+
+def scenarios(start_date, end_date, staff_ids, template_id, shift_type_id):
+    """計測するシナリオ: [{'name', 'method', 'url', 'data', 'writes', 'setup'}]
+
+    writes=True のシナリオは計測ごとにロールバックする。
+    setup は各回の実行前に呼ばれる（キャッシュを空にする等）。
+    """
+    period = {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}
+    quarter_end = start_date + datetime.timedelta(days=91)
+    items = [
+        {'name': 'shift_calendar', 'url': reverse('shift_management:calendar')},
+        {'name': 'api_shifts', 'url': reverse('shift_management:api_shifts'),
+         'data': {'start': period['start_date'], 'end': period['end_date']}},
+        {'name': 'api_shifts_cold', 'url': reverse('shift_management:api_shifts'),
+         'data': {'start': period['start_date'], 'end': period['end_date']}, 'setup': cache.clear},
+        {'name': 'time_chart', 'url': reverse('shift_management:time_chart'), 'data': period},
+        {'name': 'time_chart_quarter', 'url': reverse('shift_management:time_chart'),
+         'data': {'start_date': period['start_date'], 'end_date': quarter_end.isoformat()}},
+        {'name': 'shift_export_csv', 'method': 'post', 'url': reverse('shift_management:shift_export'),
+         'data': dict(period, format_type='csv')},
+        {'name': 'shift_export_pdf', 'method': 'post', 'url': reverse('shift_management:shift_export'),
+         'data': dict(period, format_type='pdf'), 'pdf': True},
+        {'name': 'bulk_shift_create', 'method': 'post', 'writes': True,
+         'url': reverse('shift_management:bulk_shift_create'),
+         'data': dict(period, staff=staff_ids, shift_type=shift_type_id,
+                      weekdays=[str(day) for day in range(7)], start_time='09:00', end_time='18:00')},
+    ]
+    if template_id is not None:
+        items.append({'name': 'template_apply', 'method': 'post', 'writes': True,
+                      'url': reverse('shift_management:template_apply', args=[template_id]),
+                      'data': dict(period, overwrite='on')})
+    for item in items:
+        item.setdefault('method', 'get')
+        item.setdefault('data', {})
+        item.setdefault('writes', False)
+        item.setdefault('setup', None)
+        item.setdefault('pdf', False)
+    return items
+
+
+def _request(client, scenario):
+    """1回実行して (ステータス, 応答サイズ) を返す（ストリーミング応答は読み切る）"""
+    if scenario['setup']:
+        scenario['setup']()
+    if scenario['pdf']:
+        # 毎回キャッシュなしで生成させる
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(SHIFT_PDF_CACHE_DIR=cache_dir):
+            response = getattr(client, scenario['method'])(scenario['url'], scenario['data'])
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+    else:
+        response = getattr(client, scenario['method'])(scenario['url'], scenario['data'])
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+    if hasattr(response, 'close'):
+        response.close()
+    return response.status_code, len(body)
+
+
+def _run(client, scenario):
+    if not scenario['writes']:
+        return _request(client, scenario)
+    with transaction.atomic():
+        result = _request(client, scenario)
+        transaction.set_rollback(True)
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = '主要な画面・APIをテストクライアントで実行し、処理時間・クエリ数・ピークメモリをJSONで記録します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='計測対象の月（YYYY-MM、既定: シフトのある最新の月）')
+        parser.add_argument('--staff', type=int, default=10, help='一括登録の対象スタッフ数（既定: 10）')
+        parser.add_argument('--repeat', type=int, default=5, help='計測回数（既定: 5回）')
+        parser.add_argument('--only', nargs='*', help='計測するシナリオ名')
+        parser.add_argument('--output', help='結果を書き出すJSONファイル')
+        parser.add_argument('--compare', help='比較する過去の結果（JSONファイル）')
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                start_date = datetime.datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('月は YYYY-MM 形式で指定してください')
+        else:
+            latest = Shift.objects.aggregate(latest=Max('date'))['latest'] or timezone.now().date()
+            start_date = latest.replace(day=1)
+        end_date = (start_date + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
+
+        staff_ids = [str(pk) for pk in Staff.objects.filter(is_active=True).values_list('id', flat=True)[:options['staff']]]
+        shift_type_id = ShiftType.objects.values_list('id', flat=True).first()
+        template_id = ShiftTemplate.objects.filter(is_active=True).values_list('id', flat=True).first()
+        if not staff_ids or shift_type_id is None:
+            raise CommandError('スタッフとシフト種別がありません（generate_shift_data で合成データを作成してください）')
+
+        selected = scenarios(start_date, end_date, staff_ids, template_id, shift_type_id)
+        if options['only']:
+            selected = [scenario for scenario in selected if scenario['name'] in options['only']]
+
+        results = {}
+        client = Client()
+        # テストクライアントのホスト名を許可し、一括処理はジョブにせずその場で実行させる
+        with override_settings(ALLOWED_HOSTS=['testserver', *settings.ALLOWED_HOSTS], SHIFT_JOB_THRESHOLD=10 ** 9):
+            for scenario in selected:
+                results[scenario['name']] = self._measure(client, scenario, options['repeat'])
+
+        report = {
+            'commit': _git_commit(),
+            'measured_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'period': [start_date.isoformat(), end_date.isoformat()],
+            'dataset': {
+                'staff': Staff.objects.count(),
+                'shift_types': ShiftType.objects.count(),
+                'templates': ShiftTemplate.objects.count(),
+                'shifts': Shift.objects.count(),
+            },
+            'repeat': options['repeat'],
+            'scenarios': results,
+        }
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f).get('scenarios', {})
+        self._print(report, baseline)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f'結果を書き出しました: {options["output"]}')
+
+    def _measure(self, client, scenario, repeat):
+        try:
+            # 1回目: クエリ数を記録（以降の計測はキャッシュ等が温まった状態）
+            # （記録件数の上限に達していると数えられないため、先に記録を空にする）
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                status, size = _run(client, scenario)
+            # 以降のリクエストで記録が空にされるため、ここで数えておく
+            query_count = len(queries)
+
+            timings = []
+            for _ in range(max(repeat, 1)):
+                started = time.perf_counter()
+                _run(client, scenario)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            tracemalloc.start()
+            try:
+                _run(client, scenario)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        except Exception as e:
+            return {'error': f'{type(e).__name__}: {e}'}
+
+        return {
+            'status': status,
+            'response_bytes': size,
+            'queries': query_count,
+            'wall_ms': {
+                'min': round(min(timings), 2),
+                'median': round(statistics.median(timings), 2),
+                'max': round(max(timings), 2),
+            },
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def _print(self, report, baseline):
+        dataset = report['dataset']
+        self.stdout.write(
+            f"{report['database']} / 期間 {report['period'][0]} 〜 {report['period'][1]} / "
+            f"スタッフ {dataset['staff']}名 / シフト {dataset['shifts']}件 / コミット {report['commit'] or '-'}"
+        )
+        self.stdout.write(f'{"シナリオ":<22} {"状態":>4} {"中央値(ms)":>11} {"クエリ":>6} {"ピーク(KB)":>11}  比較')
+        for name, result in report['scenarios'].items():
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f'{name:<22} エラー: {result["error"]}'))
+                continue
+            median = result['wall_ms']['median']
+            line = (f'{name:<22} {result["status"]:>4} {median:>11.1f} {result["queries"]:>6} '
+                    f'{result["peak_memory_kb"]:>11.1f}')
+            previous = (baseline or {}).get(name)
+            if previous and 'wall_ms' in previous and previous['wall_ms']['median']:
+                change = (median / previous['wall_ms']['median'] - 1) * 100
+                line += f'  {change:+.0f}% / クエリ {result["queries"] - previous["queries"]:+d}'
+            self.stdout.write(line)
@@ -0,0 +1,218 @@
+import datetime
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shift_management import synthetic
+from shift_management.events import make_cursor
+from shift_management.models import Shift, ShiftJob, ShiftTemplate, ShiftTemplateDetail, ShiftType, Staff
+
+# 合成データの規模（件数が変わるとクエリ数も変わりうるため固定する）
+DATASET = {'staff': 15, 'shift_types': 4, 'templates': 2, 'years': 1, 'seed': 1}
+DATASET_START = datetime.date(2025, 1, 1)
+MONTH = ('2025-06-01', '2025-06-30')
+METRICS_TOKEN = 'check_query_counts'
+
+# ケースごとの期待クエリ数（ビューを変えてクエリ数が変わったら、--show の結果を確認して更新する）
+EXPECTED_QUERIES = {
+    'calendar': 2,
+    'staff_list': 1,
+    'staff_create GET': 0,
+    'staff_create POST': 1,
+    'staff_edit GET': 1,
+    'staff_delete POST': 2,
+    'shift_create GET': 2,
+    'shift_create POST': 6,
+    'shift_edit GET': 3,
+    'shift_delete POST': 4,
+    'shift_reason_create GET': 1,
+    'shift_reason_create POST': 8,
+    'bulk_shift_create GET': 3,
+    'bulk_shift_create POST': 10,
+    'job_status': 1,
+    'shift_type_list': 1,
+    'shift_type_create GET': 0,
+    'shift_type_edit GET': 1,
+    'shift_type_delete POST': 5,
+    'template_list': 1,
+    'template_create POST': 1,
+    'template_edit GET': 4,
+    'template_delete POST': 3,
+    'template_apply GET': 1,
+    'template_apply preview': 3,
+    'template_apply POST': 14,
+    'template_detail_delete POST': 3,
+    'shift_export GET': 1,
+    'shift_export CSV': 2,
+    'shift_export PDF': 6,
+    'api_shifts': 1,
+    'api_shifts since': 2,
+    'api_shift_update': 6,
+    'api_shift_batch_update': 6,
+    'api_shift_delete': 4,
+    'api_job_status': 1,
+    'time_chart': 2,
+    'api_time_chart_bars': 3,
+    'monthly_summary': 2,
+    'metrics': 0,
+}
+
+
+def _fixtures():
+    """各URLに渡す対象データ（合成データの中から選ぶ）"""
+    staff = Staff.objects.filter(name__startswith=synthetic.SYNTHETIC_PREFIX).order_by('id')
+    shifts = Shift.objects.filter(
+        staff__in=staff, is_deleted_with_reason=False, date__range=MONTH
+    ).order_by('id')
+    template = ShiftTemplate.objects.filter(name__startswith=synthetic.SYNTHETIC_PREFIX).order_by('id').first()
+    return {
+        'staff': staff.first(),
+        'staff_ids': [str(pk) for pk in staff.values_list('id', flat=True)[:10]],
+        'shift': shifts.first(),
+        'shifts': list(shifts[1:6]),
+        'shift_type': ShiftType.objects.filter(name__startswith=synthetic.SYNTHETIC_PREFIX).order_by('id').first(),
+        'template': template,
+        'detail': ShiftTemplateDetail.objects.filter(template=template).order_by('id').first(),
+        'job': ShiftJob.objects.create(kind='bulk_shift_create', params={}),
+        'cursor': make_cursor(timezone.now() - datetime.timedelta(hours=1)),
+    }
+
+
+def cases(f):
+    """[(名前, メソッド, URL, データ)]（データが str ならJSON本文として送る）"""
+    url = lambda name, *args: reverse(f'shift_management:{name}', args=args)
+    month = {'start_date': MONTH[0], 'end_date': MONTH[1]}
+    shift, staff = f['shift'], f['staff']
+    return [
+        ('calendar', 'get', url('calendar'), {}),
+        ('staff_list', 'get', url('staff_list'), {}),
+        ('staff_create GET', 'get', url('staff_create'), {}),
+        ('staff_create POST', 'post', url('staff_create'), {'name': 'クエリ確認', 'is_active': 'on'}),
+        ('staff_edit GET', 'get', url('staff_edit', staff.pk), {}),
+        ('staff_delete POST', 'post', url('staff_delete', staff.pk), {}),
+        ('shift_create GET', 'get', url('shift_create'), {}),
+        ('shift_create POST', 'post', url('shift_create'), {
+            'staff': staff.pk, 'shift_type': f['shift_type'].pk, 'date': '2025-06-15',
+            'start_time': '09:00', 'end_time': '18:00',
+        }),
+        ('shift_edit GET', 'get', url('shift_edit', shift.pk), {}),
+        ('shift_delete POST', 'post', url('shift_delete', shift.pk), {}),
+        ('shift_reason_create GET', 'get', url('shift_reason_create'), {}),
+        # 既存のシフトを事由に置き換える（削除・集計の減算・トゥームストーンを含む）
+        ('shift_reason_create POST', 'post', url('shift_reason_create'), {
+            'staff': shift.staff_id, 'date': shift.date.isoformat(), 'deletion_reason': 'paid_leave',
+        }),
+        ('bulk_shift_create GET', 'get', url('bulk_shift_create'), {}),
+        ('bulk_shift_create POST', 'post', url('bulk_shift_create'), dict(
+            month, staff=f['staff_ids'], shift_type=f['shift_type'].pk,
+            weekdays=[str(day) for day in range(7)], start_time='09:00', end_time='18:00',
+        )),
+        ('job_status', 'get', url('job_status', f['job'].pk), {}),
+        ('shift_type_list', 'get', url('shift_type_list'), {}),
+        ('shift_type_create GET', 'get', url('shift_type_create'), {}),
+        ('shift_type_edit GET', 'get', url('shift_type_edit', f['shift_type'].pk), {}),
+        ('shift_type_delete POST', 'post', url('shift_type_delete', f['shift_type'].pk), {}),
+        ('template_list', 'get', url('template_list'), {}),
+        ('template_create POST', 'post', url('template_create'), {'name': 'クエリ確認', 'is_active': 'on'}),
+        ('template_edit GET', 'get', url('template_edit', f['template'].pk), {}),
+        ('template_delete POST', 'post', url('template_delete', f['template'].pk), {}),
+        ('template_apply GET', 'get', url('template_apply', f['template'].pk), {}),
+        ('template_apply preview', 'post', url('template_apply', f['template'].pk), dict(month, preview='1')),
+        ('template_apply POST', 'post', url('template_apply', f['template'].pk), dict(month, overwrite='on')),
+        ('template_detail_delete POST', 'post', url('template_detail_delete', f['detail'].pk), {}),
+        ('shift_export GET', 'get', url('shift_export'), {}),
+        ('shift_export CSV', 'post', url('shift_export'), dict(month, format_type='csv')),
+        ('shift_export PDF', 'post', url('shift_export'), dict(month, format_type='pdf')),
+        ('api_shifts', 'get', url('api_shifts'), {'start': MONTH[0], 'end': MONTH[1]}),
+        ('api_shifts since', 'get', url('api_shifts'), {'start': MONTH[0], 'end': MONTH[1], 'since': f['cursor']}),
+        ('api_shift_update', 'post', url('api_shift_update'), {
+            'shift_id': shift.pk, 'new_date': '2025-06-20', 'new_start_time': '10:00', 'new_end_time': '19:00',
+        }),
+        ('api_shift_batch_update', 'post', url('api_shift_batch_update'), json.dumps({'changes': [
+            {'shift_id': s.pk, 'new_date': '2025-06-21', 'new_start_time': '10:00', 'new_end_time': '19:00'} for s in f['shifts']
+        ]})),
+        ('api_shift_delete', 'post', url('api_shift_delete'), {'shift_id': shift.pk}),
+        ('api_job_status', 'get', url('api_job_status', f['job'].pk), {}),
+        ('time_chart', 'get', url('time_chart'), month),
+        ('api_time_chart_bars', 'get', url('api_time_chart_bars'), {'start': MONTH[0], 'end': MONTH[1], 'page': 0}),
+        ('monthly_summary', 'get', url('monthly_summary'), {'year': MONTH[0][:4]}),
+        ('metrics', 'get', url('metrics'), {}),
+    ]
+
+
+def _request(client, method, path, data):
+    if isinstance(data, str):
+        response = client.post(path, data, content_type='application/json')
+    else:
+        response = getattr(client, method)(path, data)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response.status_code
+
+
+class Command(BaseCommand):
+    help = ('shift_management の各URLのクエリ数を、合成データに対して期待値と比較します'
+            '（データは最後にロールバックします）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show', action='store_true', help='実測値を EXPECTED_QUERIES の形式で表示する')
+
+    def handle(self, *args, **options):
+        results = []
+        # キャッシュはプロセス内のものに切り替え、ケースごとに空にする
+        # （PDFはプロセスプールを使わずに、メトリクスとともに一時ディレクトリへ書き出す）
+        with tempfile.TemporaryDirectory() as work_dir, override_settings(
+            ALLOWED_HOSTS=['testserver', *settings.ALLOWED_HOSTS],
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            SHIFT_JOB_THRESHOLD=10 ** 9,
+            SHIFT_PDF_POOL=False,
+            SHIFT_PDF_CACHE_DIR=work_dir,
+            SHIFT_PDF_SLOT_DIR=work_dir,
+            SHIFT_QUERY_BUDGET_ENABLED=False,
+            SHIFT_METRICS_DIR=f'{work_dir}/metrics',
+            SHIFT_METRICS_TOKEN=METRICS_TOKEN,
+        ), transaction.atomic():
+            # 以前に生成した合成データが残っていても同じ状態から計測する
+            synthetic.clear()
+            synthetic.generate(start_date=DATASET_START, **DATASET)
+            fixtures = _fixtures()
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {METRICS_TOKEN}')
+            for name, method, path, data in cases(fixtures):
+                cache.clear()
+                reset_queries()
+                # 書き込みを伴うケースも次のケースに影響しないようロールバックする
+                with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+                    status = _request(client, method, path, data)
+                    transaction.set_rollback(True)
+                results.append((name, status, len(queries)))
+            transaction.set_rollback(True)
+
+        if options['show']:
+            self.stdout.write('EXPECTED_QUERIES = {')
+            for name, _, count in results:
+                self.stdout.write(f"    '{name}': {count},")
+            self.stdout.write('}')
+
+        failures = []
+        for name, status, count in results:
+            expected = EXPECTED_QUERIES.get(name)
+            if status >= 400:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'NG {name}: ステータス {status}'))
+            elif expected is None or count != expected:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'NG {name}: {count}クエリ（期待値 {expected}）'))
+            else:
+                self.stdout.write(f'OK {name}: {count}クエリ')
+
+        if failures:
+            raise CommandError(f'{len(failures)}件のURLでクエリ数が期待値と一致しません')
+        self.stdout.write(self.style.SUCCESS(f'{len(results)}件のURLでクエリ数が期待値と一致しました'))
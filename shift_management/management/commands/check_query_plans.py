@@ -0,0 +1,174 @@
+import datetime
+import json
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shift_management.events import make_cursor
+from shift_management.models import Shift, ShiftTombstone, ShiftType, Staff, StaffMonthlySummary
+
+# 全件走査になってはいけないテーブル
+CHECKED_TABLES = (Shift._meta.db_table, ShiftTombstone._meta.db_table, StaffMonthlySummary._meta.db_table)
+
+# 実行計画を確認する文（INSERT は走査を伴わないため対象外）
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def hot_requests(start_date, end_date, staff_ids, shift_type_id):
+    """画面・APIで頻繁に実行されるリクエスト: [(名前, メソッド, URL, データ)]
+
+    実際のビューを呼び出し、発行されたSQLの実行計画を確認する（書き込みはロールバックする）。
+    """
+    url = lambda name: reverse(f'shift_management:{name}')
+    period = {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}
+    api_period = {'start': start_date.isoformat(), 'end': end_date.isoformat()}
+    since = make_cursor(timezone.now() - datetime.timedelta(minutes=5))
+    requests = [
+        ('api_shifts（月単位キャッシュの構築）', 'get', url('api_shifts'), api_period),
+        ('api_shifts（差分同期）', 'get', url('api_shifts'), dict(api_period, since=since)),
+        ('shift_calendar', 'get', url('calendar'), period),
+        ('time_chart（統計）', 'get', url('time_chart'), period),
+        ('time_chart（バー1週間分）', 'get', url('api_time_chart_bars'), dict(api_period, page=0)),
+        ('shift_export（CSV）', 'post', url('shift_export'), dict(period, staff=staff_ids, format_type='csv')),
+        ('monthly_summary', 'get', url('monthly_summary'), {'year': start_date.year}),
+    ]
+    if staff_ids and shift_type_id:
+        requests += [
+            ('bulk_shift_create（既存シフトの確認）', 'post', url('bulk_shift_create'), dict(
+                period, staff=staff_ids, shift_type=shift_type_id,
+                weekdays=[str(day) for day in range(7)], start_time='09:00', end_time='18:00',
+            )),
+            ('ShiftReasonForm.save', 'post', url('shift_reason_create'), {
+                'staff': staff_ids[0], 'date': start_date.isoformat(), 'deletion_reason': 'paid_leave',
+            }),
+        ]
+    return requests
+
+
+def capture_statements(client, method, path, data):
+    """リクエストで発行された、CHECKED_TABLES を参照するSQL（重複は除く）"""
+    cache.clear()
+    with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+        response = getattr(client, method)(path, data)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        transaction.set_rollback(True)
+    if response.status_code >= 400:
+        raise CommandError(f'{method.upper()} {path} がステータス {response.status_code} を返しました')
+
+    statements = []
+    for query in queries.captured_queries:
+        sql = query['sql']
+        if (sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS)
+                and any(f'"{table}"' in sql or f'`{table}`' in sql for table in CHECKED_TABLES)
+                and sql not in statements):
+            statements.append(sql)
+    return statements
+
+
+def explain(sql):
+    """SQL（パラメータ埋め込み済み）の実行計画"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'EXPLAIN FORMAT=JSON {sql}')
+            return cursor.fetchone()[0]
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(row[-1] for row in cursor.fetchall())
+
+
+def _sqlite_full_scans(plan):
+    """SQLiteの EXPLAIN QUERY PLAN で、全件（インデックス全体を含む）を走査しているテーブル"""
+    scans = []
+    for table in CHECKED_TABLES:
+        for line in plan.splitlines():
+            # SEARCH はインデックスで絞り込み、SCAN は USING INDEX でもインデックス全体を読む
+            if re.search(rf'\bSCAN {table}\b', line):
+                scans.append(table)
+    return scans
+
+
+def _mysql_full_scans(plan):
+    """MySQLの EXPLAIN FORMAT=JSON で、access_type が ALL（全件）・index（インデックス全体）のテーブル"""
+    scans = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get('table_name') in CHECKED_TABLES and node.get('access_type') in ('ALL', 'index'):
+                scans.append(node['table_name'])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(json.loads(plan))
+    return scans
+
+
+class Command(BaseCommand):
+    help = '頻繁に実行されるシフト関連クエリの実行計画を確認し、全件走査があればエラー終了します（SQLite / MySQL）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='開始日（YYYY-MM-DD、既定: 今月1日）')
+        parser.add_argument('--end', help='終了日（YYYY-MM-DD、既定: 開始日の1か月後）')
+        parser.add_argument('--verbose-plan', action='store_true', help='実行計画の全文を表示する')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ('sqlite', 'mysql'):
+            raise CommandError(f'このデータベース（{vendor}）の実行計画の確認には対応していません')
+
+        try:
+            start_date = (
+                datetime.date.fromisoformat(options['start']) if options['start']
+                else timezone.now().date().replace(day=1)
+            )
+            end_date = (
+                datetime.date.fromisoformat(options['end']) if options['end']
+                else start_date + datetime.timedelta(days=30)
+            )
+        except ValueError:
+            raise CommandError('日付は YYYY-MM-DD 形式で指定してください')
+
+        staff_ids = list(Staff.objects.filter(is_active=True).values_list('id', flat=True)[:5])
+        shift_type_id = ShiftType.objects.values_list('id', flat=True).first()
+
+        failures = []
+        # キャッシュはプロセス内のものに切り替え、毎回データベースから構築させる
+        with override_settings(
+            ALLOWED_HOSTS=['testserver', *settings.ALLOWED_HOSTS],
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            SHIFT_JOB_THRESHOLD=10 ** 9,
+            SHIFT_QUERY_BUDGET_ENABLED=False,
+            SHIFT_METRICS_ENABLED=False,
+        ):
+            client = Client()
+            for label, method, path, data in hot_requests(start_date, end_date, staff_ids, shift_type_id):
+                statements = capture_statements(client, method, path, data)
+                if not statements:
+                    self.stdout.write(f'-- {label}: シフトのテーブルを参照するクエリなし')
+                    continue
+                for index, sql in enumerate(statements, 1):
+                    name = f'{label} #{index}' if len(statements) > 1 else label
+                    plan = explain(sql)
+                    scans = _mysql_full_scans(plan) if vendor == 'mysql' else _sqlite_full_scans(plan)
+
+                    if scans:
+                        failures.append(name)
+                        self.stdout.write(self.style.ERROR(f'NG {name}: 全件走査 {", ".join(sorted(set(scans)))}'))
+                    else:
+                        self.stdout.write(f'OK {name}')
+                    if options['verbose_plan'] or scans:
+                        self.stdout.write(sql)
+                        self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{len(failures)}件のクエリでインデックスが使われていません')
+        self.stdout.write(self.style.SUCCESS(f'{vendor}: すべてのクエリでインデックスが使われています'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from shift_management import event_cache
+
+
+class Command(BaseCommand):
+    help = ('api_shifts のイベントキャッシュのヒット・ミス件数を表示します'
+            '（SHIFT_METRICS_ENABLED が有効な場合に記録されます）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='表示後に件数を0から数え直す（/metrics のカウンタは変わりません）')
+
+    def handle(self, *args, **options):
+        stats = event_cache.cache_stats()
+        ratio = stats['hit_ratio']
+        self.stdout.write(f"hits: {stats['hits']}")
+        self.stdout.write(f"misses: {stats['misses']}")
+        self.stdout.write(f"hit ratio: {'-' if ratio is None else f'{ratio:.1%}'}")
+
+        if options['reset']:
+            event_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('カウンタをリセットしました'))
@@ -0,0 +1,51 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shift_management import synthetic
+
+
+class Command(BaseCommand):
+    help = '性能計測用の合成データ（スタッフ・シフト種別・テンプレート・シフト・事由）を作成します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--staff', type=int, default=30, help='スタッフ数（既定: 30）')
+        parser.add_argument('--shift-types', type=int, default=5, help='シフト種別数（既定: 5）')
+        parser.add_argument('--templates', type=int, default=3, help='テンプレート数（既定: 3）')
+        parser.add_argument('--years', type=int, default=1, help='シフトを作成する年数（既定: 1）')
+        parser.add_argument('--start', help='シフトの開始日（YYYY-MM-DD、既定: 今年の1月1日）')
+        parser.add_argument('--work-rate', type=float, default=0.6, help='1日あたりの出勤率（既定: 0.6）')
+        parser.add_argument('--reason-rate', type=float, default=0.05, help='1日あたりの事由（休暇など）の割合（既定: 0.05）')
+        parser.add_argument('--seed', type=int, default=0, help='乱数の種（既定: 0）')
+        parser.add_argument('--clear', action='store_true', help='作成前に既存の合成データを削除する')
+        parser.add_argument('--clear-only', action='store_true', help='合成データを削除するだけで作成しない')
+
+    def handle(self, *args, **options):
+        if options['clear'] or options['clear_only']:
+            synthetic.clear()
+            self.stdout.write('既存の合成データを削除しました')
+            if options['clear_only']:
+                return
+
+        try:
+            start_date = datetime.date.fromisoformat(options['start']) if options['start'] else None
+        except ValueError:
+            raise CommandError('日付は YYYY-MM-DD 形式で指定してください')
+        if options['shift_types'] < 1 or options['staff'] < 1:
+            raise CommandError('スタッフ数・シフト種別数は1以上を指定してください')
+
+        counts = synthetic.generate(
+            staff=options['staff'],
+            shift_types=options['shift_types'],
+            templates=options['templates'],
+            years=options['years'],
+            start_date=start_date,
+            work_rate=options['work_rate'],
+            reason_rate=options['reason_rate'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"合成データを作成しました: スタッフ {counts['staff']}名 / シフト種別 {counts['shift_types']}件 / "
+            f"テンプレート {counts['templates']}件（詳細 {counts['template_details']}件） / "
+            f"シフト {counts['shifts']}件（{counts['start_date']} 〜 {counts['end_date']}）"
+        ))
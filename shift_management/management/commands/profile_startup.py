@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# CGIの起動時（django.cgi の処理＋最初のリクエストでのURL解決）に読み込まれてはいけないモジュール
+HEAVY_MODULES = ('weasyprint', 'pypdf', 'concurrent.futures.process')
+
+# django.cgi と同じ手順で起動し、最初のリクエストでビューが読み込まれるところまでを計測する
+STARTUP_SCRIPT = '''
+import time
+started = time.perf_counter()
+import django
+from django.core.wsgi import get_wsgi_application
+django.setup()
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print((time.perf_counter() - started) * 1000)
+'''
+
+
+def _parse_importtime(stderr):
+    """python -X importtime の出力を {モジュール名: (自身の時間, 累計時間)}（マイクロ秒）にする"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            # ヘッダー行
+            continue
+    return modules
+
+
+def _measure():
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise CommandError(f'起動に失敗しました:\n{result.stderr[-2000:]}')
+    return float(result.stdout.strip().splitlines()[-1]), _parse_importtime(result.stderr)
+
+
+class Command(BaseCommand):
+    help = 'CGIエントリポイントのコールドスタート時間を計測し、モジュールごとのimport時間を表示します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='計測回数（最速の回を採用、既定: 3回）')
+        parser.add_argument('--top', type=int, default=20, help='表示するモジュール数（既定: 20）')
+        parser.add_argument(
+            '--budget', type=float,
+            default=getattr(settings, 'SHIFT_COLD_START_BUDGET_MS', 1000),
+            help='許容する起動時間（ミリ秒、既定: SHIFT_COLD_START_BUDGET_MS）',
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='予算超過または重いモジュールの読み込みがあればエラー終了する',
+        )
+
+    def handle(self, *args, **options):
+        runs = [_measure() for _ in range(max(options['repeat'], 1))]
+        elapsed, modules = min(runs, key=lambda run: run[0])
+
+        self.stdout.write(f'起動時間: {elapsed:.1f}ms（予算 {options["budget"]:.0f}ms） / モジュール {len(modules)}個')
+        self.stdout.write(f'{"自身(ms)":>10} {"累計(ms)":>10}  モジュール')
+        ranked = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (self_us, cumulative_us) in ranked[:options['top']]:
+            self.stdout.write(f'{self_us / 1000:>10.1f} {cumulative_us / 1000:>10.1f}  {name}')
+
+        problems = []
+        heavy = sorted(
+            name for name in modules
+            if any(name == heavy or name.startswith(heavy + '.') for heavy in HEAVY_MODULES)
+        )
+        if heavy:
+            problems.append(f'起動時に重いモジュールが読み込まれています: {", ".join(heavy)}')
+        if elapsed > options['budget']:
+            problems.append(f'起動時間が予算を超えています: {elapsed:.1f}ms > {options["budget"]:.0f}ms')
+
+        for problem in problems:
+            self.stdout.write(self.style.WARNING(problem))
+        if problems and options['check']:
+            raise CommandError('コールドスタートのチェックに失敗しました')
+        if not problems:
+            self.stdout.write(self.style.SUCCESS('コールドスタートは予算内です'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shift_management.events import tombstone_retention
+from shift_management.models import ShiftTombstone
+
+
+class Command(BaseCommand):
+    help = '差分同期の保持期間を過ぎた削除済みシフトの記録を削除します'
+
+    def handle(self, *args, **options):
+        threshold = timezone.now() - tombstone_retention()
+        deleted, _ = ShiftTombstone.objects.filter(deleted_at__lt=threshold).delete()
+        self.stdout.write(self.style.SUCCESS(f'{deleted}件の削除記録を削除しました'))
@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shift_management import summaries
+
+
+class Command(BaseCommand):
+    help = 'スタッフ別・月別の集計をシフトから作り直します（--check は差分の確認のみ）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', nargs='*', help='対象の月（YYYY-MM、既定: すべての月）')
+        parser.add_argument('--check', action='store_true', help='集計とシフトの差分を表示し、差分があればエラー終了する')
+
+    def handle(self, *args, **options):
+        months = None
+        if options['month']:
+            try:
+                months = [datetime.datetime.strptime(month, '%Y-%m').date() for month in options['month']]
+            except ValueError:
+                raise CommandError('月は YYYY-MM 形式で指定してください')
+
+        differences = summaries.drift(months)
+        for staff_id, month, stored, expected in differences:
+            changes = ', '.join(
+                f'{field} {stored[field]}→{expected[field]}'
+                for field in summaries.COUNT_FIELDS if stored[field] != expected[field]
+            )
+            self.stdout.write(f'スタッフ {staff_id} {month:%Y-%m}: {changes}')
+
+        if options['check']:
+            if differences:
+                raise CommandError(f'{len(differences)}件の集計がシフトと一致しません（--check を外して実行すると作り直します）')
+            self.stdout.write(self.style.SUCCESS('集計はシフトと一致しています'))
+            return
+
+        rows = summaries.rebuild(months)
+        self.stdout.write(self.style.SUCCESS(
+            f'集計を作り直しました: {rows}行（差分があった行 {len(differences)}件）'
+        ))
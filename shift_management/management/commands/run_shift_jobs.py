@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from shift_management.jobs import claim_next, fail_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = '一括処理ジョブ（一括登録・テンプレート適用）を実行するワーカーを起動します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='待機中のジョブを処理し終えたら終了する')
+        parser.add_argument('--interval', type=float, default=2.0, help='ジョブがないときの待機秒数（既定: 2秒）')
+
+    def handle(self, *args, **options):
+        self.stdout.write('ジョブワーカーを開始しました')
+        try:
+            while True:
+                close_old_connections()
+                stale = fail_stale_jobs()
+                if stale:
+                    self.stdout.write(self.style.WARNING(f'応答のない実行中ジョブを{stale}件失敗にしました'))
+                job = claim_next()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+
+                self.stdout.write(f'実行中: {job}')
+                job = run_job(job)
+                if job.status == 'succeeded':
+                    self.stdout.write(self.style.SUCCESS(f'完了: {job} {job.result}'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'失敗: {job}\n{job.error}'))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write('ジョブワーカーを終了しました')
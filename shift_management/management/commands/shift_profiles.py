@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from shift_management import profiling
+
+
+class Command(BaseCommand):
+    help = 'リクエスト単位のプロファイル（?_profile=1 / X-Shift-Profile）の一覧・削除・集計を行います'
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest='action', required=True)
+
+        actions.add_parser('list', help='保存済みのプロファイルを新しい順に表示する')
+
+        prune = actions.add_parser('prune', help='古いプロファイルを削除する')
+        prune.add_argument('--keep', type=int, help='新しいものから残す件数')
+        prune.add_argument('--days', type=float, help='この日数より古いものを削除する')
+
+        show = actions.add_parser('show', help='プロファイルの上位の関数を表示する')
+        show.add_argument('name', nargs='?', help='プロファイル名（既定: 最新）')
+        show.add_argument('--top', type=int, default=20, help='表示する関数の数（既定: 20）')
+        show.add_argument('--sort', default='cumulative', help='並び順（cumulative / tottime / calls、既定: cumulative）')
+
+        token = actions.add_parser('token', help='X-Shift-Profile ヘッダーに使う署名付きトークンを発行する')
+        token.add_argument('username', help='スタッフユーザー名')
+
+    def handle(self, *args, **options):
+        getattr(self, f"handle_{options['action']}")(options)
+
+    def handle_list(self, options):
+        profiles = profiling.list_profiles()
+        if not profiles:
+            self.stdout.write(f'プロファイルはありません（{profiling.profile_dir()}）')
+            return
+        for meta in profiles:
+            self.stdout.write(
+                f"{meta['name']}  {meta['elapsed_ms']:>9.1f}ms  {meta['status']}  {meta['user']}  "
+                f"{meta['method']} {meta['path']}  {meta['get'] or ''}"
+            )
+
+    def handle_prune(self, options):
+        if options['keep'] is None and options['days'] is None:
+            raise CommandError('--keep か --days を指定してください')
+        older_than = options['days'] * 24 * 60 * 60 if options['days'] is not None else None
+        removed = profiling.prune(keep=options['keep'], older_than=older_than)
+        self.stdout.write(self.style.SUCCESS(f'{removed}件のプロファイルを削除しました'))
+
+    def handle_show(self, options):
+        name = options['name']
+        if name is None:
+            profiles = profiling.list_profiles()
+            if not profiles:
+                raise CommandError('プロファイルはありません')
+            name = profiles[0]['name']
+        meta = next((meta for meta in profiling.list_profiles() if meta['name'] == name), None)
+        try:
+            summary = profiling.summarize(name, limit=options['top'], sort=options['sort'])
+        except FileNotFoundError:
+            raise CommandError(f'プロファイルが見つかりません: {name}')
+        except KeyError:
+            raise CommandError(f'並び順が正しくありません: {options["sort"]}')
+        if meta:
+            self.stdout.write(
+                f"{meta['method']} {meta['path']}（{meta['view_name']}） {meta['status']} / "
+                f"{meta['elapsed_ms']}ms / {meta['profiled_at']} / {meta['user']}"
+            )
+            self.stdout.write(f"GET: {meta['get']}  POST: {meta['post']}")
+        self.stdout.write(summary)
+
+    def handle_token(self, options):
+        if not get_user_model().objects.filter(username=options['username'], is_active=True, is_staff=True).exists():
+            raise CommandError(f'有効なスタッフユーザーではありません: {options["username"]}')
+        self.stdout.write(profiling.make_token(options['username']))
@@ -0,0 +1,337 @@
+"""
+Prometheus形式のメトリクス
+
+リクエストの処理時間・クエリ数のヒストグラム（ビュー名ごと）と、エクスポート・
+一括登録・テンプレート適用の件数、キャッシュのヒット・ミス件数を集計する。
+
+値はプロセスごとに自分の累計をメモリに持ち、SHIFT_METRICS_DIR（本番は cache/metrics/）の
+自分専用のファイル（{pid}-{ID}.json）に書き出す。ファイルを書くのはそのプロセスだけのため、
+複数のワーカープロセス・ジョブ用プロセス・CGIのプロセスが同時に記録しても取りこぼさない。
+render() は全ファイルを合算し、終了したプロセスのファイルは archive.json にまとめて削除する。
+1リクエスト分の記録は Batch にまとめ、応答後に1回だけ書き出す。
+"""
+
+import contextvars
+import json
+import os
+import threading
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+
+try:
+    import fcntl
+except ImportError:  # Windows（ローカル開発）では終了したプロセスのファイルをまとめない
+    fcntl = None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+ARCHIVE = 'archive.json'
+LOCK_FILE = 'metrics.lock'
+
+# ヒストグラムのバケット上限（この外側が +Inf）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# 集計対象外のビューはまとめてこの名前で記録する
+OTHER_VIEW = 'other'
+
+# ヒストグラム: 名前 → (説明, バケット, 合計値の保存倍率)
+# （値は整数で保存するため、秒はマイクロ秒で保存する）
+HISTOGRAMS = {
+    'shift_http_request_duration_seconds': ('リクエストの処理時間（秒）', LATENCY_BUCKETS, 1_000_000),
+    'shift_http_request_queries': ('リクエストあたりのSQL実行回数', QUERY_BUCKETS, 1),
+}
+
+# カウンタ: 名前 → (説明, ラベル名, ラベル値)
+COUNTERS = {
+    'shift_exports_total': ('生成したエクスポートの件数', 'format', ('csv', 'pdf')),
+    'shift_bulk_created_shifts_total': ('一括登録で作成したシフトの件数', None, None),
+    'shift_template_applications_total': ('テンプレートを適用した回数', None, None),
+    'shift_template_created_shifts_total': ('テンプレート適用で作成したシフトの件数', None, None),
+    'shift_pdf_cache_hits_total': ('PDFキャッシュのヒット件数', None, None),
+    'shift_pdf_cache_misses_total': ('PDFキャッシュのミス件数', None, None),
+    'shift_event_cache_hits_total': ('api_shifts のイベントキャッシュのヒット件数（月単位）', None, None),
+    'shift_event_cache_misses_total': ('api_shifts のイベントキャッシュのミス件数（月単位）', None, None),
+}
+
+_current = contextvars.ContextVar('shift_metrics_batch', default=None)
+
+# このプロセスの累計（fork 後は pid が変わるため作り直す）
+_lock = threading.Lock()
+_process = None  # (pid, ファイル名)
+_totals = None
+
+
+def metrics_dir():
+    return Path(getattr(settings, 'SHIFT_METRICS_DIR', settings.BASE_DIR / 'cache' / 'metrics'))
+
+
+def enabled():
+    return getattr(settings, 'SHIFT_METRICS_ENABLED', False)
+
+
+def view_names():
+    # urls → views → metrics の循環を避けるため、ここで読み込む
+    from .urls import app_name, urlpatterns
+
+    return [f'{app_name}:{pattern.name}' for pattern in urlpatterns if pattern.name] + [OTHER_VIEW]
+
+
+_known = None
+
+
+def _known_views():
+    global _known
+    if _known is None:
+        _known = frozenset(view_names())
+    return _known
+
+
+def _empty_histogram(name):
+    return [0] * (len(HISTOGRAMS[name][1]) + 3)
+
+
+def _counter_key(name, label=None):
+    return f'{name}:{label}' if label else name
+
+
+def _empty_totals():
+    """{'counters': {キー: 値}, 'views': {ビュー名: {名前: [バケットごとの件数..., 合計, 件数]}}}"""
+    return {'counters': {}, 'views': {}}
+
+
+def _merge(totals, other):
+    for key, value in other.get('counters', {}).items():
+        totals['counters'][key] = totals['counters'].get(key, 0) + value
+    for view, histograms in other.get('views', {}).items():
+        merged = totals['views'].setdefault(view, {})
+        for name, values in histograms.items():
+            previous = merged.get(name)
+            if name not in HISTOGRAMS or len(values) != len(_empty_histogram(name)):
+                continue
+            if previous is None:
+                previous = _empty_histogram(name)
+            merged[name] = [a + b for a, b in zip(previous, values)]
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, data):
+    """別のファイルに書いてから置き換える（読み手が書きかけの内容を読まないように）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    temporary.write_text(json.dumps(data, separators=(',', ':')), encoding='utf-8')
+    os.replace(temporary, path)
+
+
+class Batch:
+    """記録をまとめておき、flush() でこのプロセスの累計に加えて1回で書き出す"""
+
+    def __init__(self):
+        self.counters = {}
+        self.views = {}
+
+    def inc(self, key, amount):
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, view_name, seconds, queries):
+        if view_name not in _known_views():
+            view_name = OTHER_VIEW
+        histograms = self.views.setdefault(view_name, {})
+        for name, value in (('shift_http_request_duration_seconds', seconds), ('shift_http_request_queries', queries)):
+            _, buckets, scale = HISTOGRAMS[name]
+            values = histograms.setdefault(name, _empty_histogram(name))
+            values[bisect_left(buckets, value)] += 1
+            values[-2] += int(round(value * scale))
+            values[-1] += 1
+
+    def flush(self):
+        global _process, _totals
+        if not self.counters and not self.views:
+            return
+        with _lock:
+            if _process is None or _process[0] != os.getpid():
+                _process = (os.getpid(), f'{os.getpid()}-{uuid.uuid4().hex[:12]}.json')
+                _totals = _empty_totals()
+            _merge(_totals, {'counters': self.counters, 'views': self.views})
+            # 書き出しもロック内で行い、古い累計で新しい累計を上書きしないようにする
+            _write(metrics_dir() / _process[1], _totals)
+        self.counters = {}
+        self.views = {}
+
+
+def start_batch():
+    """以降の inc() をまとめる Batch を用意する（MetricsMiddleware が1リクエストごとに使う）
+
+    戻り値: (Batch, end_batch() に渡すトークン)
+    """
+    batch = Batch()
+    return batch, _current.set(batch)
+
+
+def end_batch(token):
+    _current.reset(token)
+
+
+def inc(name, amount=1, label=None):
+    """カウンタを増やす（SHIFT_METRICS_ENABLED が False なら何もしない）"""
+    if amount <= 0 or not enabled():
+        return
+    batch = _current.get()
+    if batch is not None:
+        batch.inc(_counter_key(name, label), amount)
+        return
+    # リクエスト外（ジョブ用プロセス等）ではその場で書き出す
+    batch = Batch()
+    batch.inc(_counter_key(name, label), amount)
+    batch.flush()
+
+
+def _alive(name):
+    try:
+        pid = int(name.split('-', 1)[0])
+    except ValueError:
+        return True
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _compact(directory):
+    """終了したプロセスのファイルを archive.json に加えて削除する（ロックを取得して呼ぶ）
+
+    archive.json には直前にまとめたファイル名を残し、削除前に中断しても二重に数えないようにする。
+    """
+    archive = _read(directory / ARCHIVE) or {}
+    for name in archive.get('merged', ()):
+        (directory / name).unlink(missing_ok=True)
+    for path in directory.glob('*.tmp'):
+        if not _alive(path.name):
+            path.unlink(missing_ok=True)
+
+    dead = [path for path in directory.glob('*.json') if path.name != ARCHIVE and not _alive(path.name)]
+    if not dead:
+        return
+    totals = _empty_totals()
+    _merge(totals, archive)
+    for path in dead:
+        _merge(totals, _read(path) or {})
+    _write(directory / ARCHIVE, {**totals, 'merged': [path.name for path in dead]})
+    for path in dead:
+        path.unlink(missing_ok=True)
+
+
+def collect():
+    """全プロセスの累計の合計（_empty_totals() と同じ形式）"""
+    directory = metrics_dir()
+    totals = _empty_totals()
+    if not directory.is_dir():
+        return totals
+
+    lock_file = None
+    if fcntl is not None:
+        # まとめている途中のファイルを読み飛ばさないよう、合算中も排他する
+        lock_file = open(directory / LOCK_FILE, 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+    try:
+        if lock_file is not None:
+            _compact(directory)
+        archive = _read(directory / ARCHIVE) or {}
+        merged = set(archive.get('merged', ()))
+        _merge(totals, archive)
+        for path in directory.glob('*.json'):
+            if path.name != ARCHIVE and path.name not in merged:
+                _merge(totals, _read(path) or {})
+    finally:
+        if lock_file is not None:
+            lock_file.close()
+    return totals
+
+
+def counter_value(totals, name, label=None):
+    """collect() の結果からカウンタの値を取り出す"""
+    return totals['counters'].get(_counter_key(name, label), 0)
+
+
+def _ratio(hits, misses):
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+
+def record_shift_plan(kind, created):
+    """一括登録（bulk_shift_create）・テンプレート適用（template_apply）の結果を記録する"""
+    if kind == 'template_apply':
+        inc('shift_template_applications_total')
+        inc('shift_template_created_shifts_total', created)
+    else:
+        inc('shift_bulk_created_shifts_total', created)
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _header(lines, name, help_text, kind):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def render():
+    """Prometheus のテキスト形式（version 0.0.4）"""
+    totals = collect()
+    lines = []
+
+    for name, (help_text, buckets, scale) in HISTOGRAMS.items():
+        _header(lines, name, help_text, 'histogram')
+        for view in view_names():
+            histogram = totals['views'].get(view, {}).get(name)
+            if not histogram or not histogram[-1]:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), histogram):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            total = histogram[-2] / scale if scale != 1 else histogram[-2]
+            lines.append(f'{name}_sum{{view="{view}"}} {_format_value(total)}')
+            lines.append(f'{name}_count{{view="{view}"}} {histogram[-1]}')
+
+    for name, (help_text, label_name, label_values) in COUNTERS.items():
+        _header(lines, name, help_text, 'counter')
+        if label_name:
+            for label in label_values:
+                lines.append(f'{name}{{{label_name}="{label}"}} {counter_value(totals, name, label)}')
+        else:
+            lines.append(f'{name} {counter_value(totals, name)}')
+
+    _header(lines, 'shift_cache_hit_ratio', 'キャッシュのヒット率（ヒット・ミスがなければ出力しない）', 'gauge')
+    for cache_name, prefix in (('event', 'shift_event_cache'), ('pdf', 'shift_pdf_cache')):
+        ratio = _ratio(counter_value(totals, f'{prefix}_hits_total'), counter_value(totals, f'{prefix}_misses_total'))
+        if ratio is not None:
+            lines.append(f'shift_cache_hit_ratio{{cache="{cache_name}"}} {ratio}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def is_authorized(request):
+    """スタッフユーザー、または SHIFT_METRICS_TOKEN と一致する Bearer トークン"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+    token = getattr(settings, 'SHIFT_METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    return bool(token) and authorization.startswith('Bearer ') and constant_time_compare(
+        authorization[len('Bearer '):], token
+    )
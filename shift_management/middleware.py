@@ -0,0 +1,273 @@
+"""
+リクエスト単位の計測用ミドルウェア
+"""
+
+import cProfile
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse
+
+from . import metrics, profiling, timing
+
+query_logger = logging.getLogger('shift_management.queries')
+timing_logger = logging.getLogger('shift_management.timing')
+
+
+class QueryRecorder:
+    """実行されたSQLの件数・所要時間を記録する（DEBUG=False でも動作）"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.statements = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.total += elapsed
+            self.statements.append((elapsed, sql))
+
+    def start(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def stop(self):
+        if self._stack is not None:
+            self._stack.close()
+            self._stack = None
+
+    def slowest(self, limit):
+        return sorted(self.statements, key=lambda item: item[0], reverse=True)[:limit]
+
+
+def _query_budget(view_name):
+    budgets = getattr(settings, 'SHIFT_QUERY_BUDGETS', {})
+    return budgets.get(view_name, getattr(settings, 'SHIFT_QUERY_BUDGET_DEFAULT', 20))
+
+
+class QueryBudgetMiddleware:
+    """ビューごとのクエリ数・DB時間を記録し、予算を超えたら警告をログに出す
+
+    SHIFT_QUERY_BUDGET_ENABLED が True のときだけ有効。
+    予算は SHIFT_QUERY_BUDGETS（ビュー名 → クエリ数）、なければ SHIFT_QUERY_BUDGET_DEFAULT。
+    DB時間の上限は SHIFT_QUERY_TIME_BUDGET_MS。ストリーミング応答は送信し終えた時点で集計する。
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SHIFT_QUERY_BUDGET_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder().start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            recorder.stop()
+            raise
+
+        if response.streaming and not isinstance(response, FileResponse):
+            response.streaming_content = self._report_after(response.streaming_content, request, recorder)
+        else:
+            recorder.stop()
+            self.report(request, recorder)
+        return response
+
+    def _report_after(self, content, request, recorder):
+        try:
+            yield from content
+        finally:
+            recorder.stop()
+            self.report(request, recorder)
+
+    def report(self, request, recorder):
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        budget = _query_budget(view_name)
+        time_budget = getattr(settings, 'SHIFT_QUERY_TIME_BUDGET_MS', 500)
+        total_ms = recorder.total * 1000
+
+        summary = f'{view_name}: {recorder.count}クエリ / DB {total_ms:.1f}ms（予算 {budget}クエリ / {time_budget}ms）'
+        if recorder.count <= budget and total_ms <= time_budget:
+            query_logger.debug(summary)
+            return
+        slowest = '\n'.join(
+            f'  {elapsed * 1000:.1f}ms {sql[:300]}'
+            for elapsed, sql in recorder.slowest(getattr(settings, 'SHIFT_QUERY_BUDGET_SLOWEST', 3))
+        )
+        query_logger.warning(f'クエリ予算超過 {summary} {request.method} {request.get_full_path()}\n{slowest}')
+
+
+class ServerTimingMiddleware:
+    """応答に Server-Timing ヘッダー（DB・テンプレート描画・PDFレイアウト・Python）を付け、同じ内訳をログに出す
+
+    SHIFT_SERVER_TIMING_ENABLED が True のときだけ有効。ログは shift_management.timing ロガーに出力する。
+    内部の処理時間を外部に見せないよう、ヘッダーは DEBUG のとき、またはスタッフユーザーへの応答にだけ付ける。
+    ストリーミング応答（CSV等）のヘッダーには応答を返すまでの分だけを載せ、ログは送信し終えた時点の値で出す。
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SHIFT_SERVER_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder().start()
+        timer, token = timing.start(recorder)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            recorder.stop()
+            raise
+        finally:
+            timing.finish(token)
+
+        if self.show_header(request):
+            response['Server-Timing'] = timer.header()
+        if response.streaming and not isinstance(response, FileResponse):
+            response.streaming_content = self._log_after(response.streaming_content, request, response, timer)
+        else:
+            timer.stop()
+            recorder.stop()
+            self.log(request, response, timer)
+        return response
+
+    def show_header(self, request):
+        if settings.DEBUG:
+            return True
+        # ビューがユーザーを読み込んでいない場合は、ヘッダーのためにセッション・ユーザーを引かない
+        user = getattr(request, '_cached_user', None)
+        return user is not None and user.is_authenticated and user.is_staff
+
+    def _log_after(self, content, request, response, timer):
+        try:
+            yield from content
+        finally:
+            timer.stop()
+            timer.recorder.stop()
+            self.log(request, response, timer)
+
+    def log(self, request, response, timer):
+        match = request.resolver_match
+        view_name = match.view_name if match else '-'
+        phases = ' '.join(f'{name}={ms:.1f}ms' for name, ms in timer.breakdown().items())
+        timing_logger.info(
+            f'{request.method} {request.path} {view_name} {response.status_code} '
+            f'{phases} queries={timer.recorder.count}'
+        )
+
+
+class ProfileMiddleware:
+    """スタッフが要求したリクエストだけを cProfile で計測し、profiling.save() で保存する
+
+    SHIFT_PROFILE_ENABLED が True のときだけ有効（AuthenticationMiddleware より後に置く）。
+    保存したプロファイル名は応答の X-Shift-Profile ヘッダーに付ける（ストリーミング応答を除く）。
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SHIFT_PROFILE_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        username = profiling.requested_by(request)
+        if username is None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 他のプロファイラが動いている
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+
+        if response.streaming and not isinstance(response, FileResponse):
+            response.streaming_content = self._profile_iteration(
+                response.streaming_content, profiler, request, response, username, started
+            )
+            return response
+        response[profiling.HEADER] = profiling.save(
+            profiler, request, response, username, time.perf_counter() - started
+        )
+        return response
+
+    def _profile_iteration(self, content, profiler, request, response, username, started):
+        iterator = iter(content)
+        try:
+            while True:
+                profiler.enable()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    profiler.disable()
+                yield chunk
+        finally:
+            profiling.save(profiler, request, response, username, time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """ビューごとの処理時間・クエリ数を metrics のヒストグラムに記録する
+
+    SHIFT_METRICS_ENABLED が True のときだけ有効。リクエスト中のカウンタもまとめて、応答後に1回で保存する。
+    ストリーミング応答は送信し終えた時点で記録する。
+    """
+
+    def __init__(self, get_response):
+        if not metrics.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        batch, token = metrics.start_batch()
+        recorder = QueryRecorder().start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            recorder.stop()
+            batch.flush()
+            raise
+        finally:
+            metrics.end_batch(token)
+
+        if response.streaming and not isinstance(response, FileResponse):
+            response.streaming_content = self._observe_after(
+                response.streaming_content, request, batch, recorder, started
+            )
+        else:
+            recorder.stop()
+            self.observe(request, batch, recorder, started)
+        return response
+
+    def _observe_after(self, content, request, batch, recorder, started):
+        try:
+            yield from content
+        finally:
+            recorder.stop()
+            self.observe(request, batch, recorder, started)
+
+    def observe(self, request, batch, recorder, started):
+        match = request.resolver_match
+        batch.observe(
+            match.view_name if match else metrics.OTHER_VIEW, time.perf_counter() - started, recorder.count
+        )
+        batch.flush()
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shift_management', '0003_alter_shift_unique_together_alter_shift_end_time_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shifttype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新日時'),
+        ),
+    ]
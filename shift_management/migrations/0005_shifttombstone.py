@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shift_management', '0004_shifttype_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shift_id', models.BigIntegerField(verbose_name='シフトID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='削除日時')),
+            ],
+            options={
+                'verbose_name': '削除済みシフト',
+                'verbose_name_plural': '削除済みシフト',
+            },
+        ),
+    ]
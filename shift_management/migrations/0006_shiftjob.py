@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shift_management', '0005_shifttombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('bulk_shift_create', 'シフト一括登録'), ('template_apply', 'テンプレート適用')], max_length=50, verbose_name='処理種別')),
+                ('params', models.JSONField(default=dict, verbose_name='パラメータ')),
+                ('status', models.CharField(choices=[('pending', '待機中'), ('running', '実行中'), ('succeeded', '完了'), ('failed', '失敗')], db_index=True, default='pending', max_length=20, verbose_name='状態')),
+                ('progress_done', models.IntegerField(default=0, verbose_name='処理済み件数')),
+                ('progress_total', models.IntegerField(default=0, verbose_name='全体件数')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='結果')),
+                ('error', models.TextField(blank=True, default='', verbose_name='エラー内容')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='作成日時')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始日時')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='終了日時')),
+            ],
+            options={
+                'verbose_name': '一括処理ジョブ',
+                'verbose_name_plural': '一括処理ジョブ',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
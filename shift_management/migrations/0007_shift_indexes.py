@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shift_management', '0006_shiftjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['date', 'start_time'], name='shift_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['staff', 'date'], name='shift_staff_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['is_deleted_with_reason', 'date'], name='shift_reason_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['updated_at'], name='shift_updated_idx'),
+        ),
+    ]
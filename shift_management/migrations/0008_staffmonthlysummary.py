@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:42
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+
+REASON_CODES = ['public_holiday', 'paid_leave', 'paid_leave_am', 'paid_leave_pm', 'absenteeism', 'other']
+
+
+def backfill_summaries(apps, schema_editor):
+    """既存のシフトから集計を作成する（summaries.compute() と同じ集計を履歴モデルで行う）"""
+    Shift = apps.get_model('shift_management', 'Shift')
+    StaffMonthlySummary = apps.get_model('shift_management', 'StaffMonthlySummary')
+    db_alias = schema_editor.connection.alias
+
+    totals = defaultdict(lambda: defaultdict(int))
+    rows = Shift.objects.using(db_alias).order_by().values_list(
+        'staff_id', 'date', 'start_time', 'end_time', 'is_deleted_with_reason', 'deletion_reason'
+    )
+    for staff_id, date, start_time, end_time, is_deleted_with_reason, deletion_reason in rows.iterator(chunk_size=2000):
+        counts = totals[(staff_id, date.replace(day=1))]
+        if is_deleted_with_reason:
+            code = deletion_reason if deletion_reason in REASON_CODES else 'other'
+            counts[f'{code}_count'] += 1
+            continue
+        counts['shift_count'] += 1
+        if start_time is not None and end_time is not None:
+            # 終了が開始以前なら日をまたぐシフトとみなす
+            start = start_time.hour * 60 + start_time.minute
+            end = end_time.hour * 60 + end_time.minute
+            counts['scheduled_minutes'] += end - start + (24 * 60 if end <= start else 0)
+
+    StaffMonthlySummary.objects.using(db_alias).bulk_create(
+        [StaffMonthlySummary(staff_id=staff_id, month=month, **counts)
+         for (staff_id, month), counts in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shift_management', '0007_shift_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffMonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='月')),
+                ('scheduled_minutes', models.IntegerField(default=0, verbose_name='勤務予定時間（分）')),
+                ('shift_count', models.IntegerField(default=0, verbose_name='シフト数')),
+                ('public_holiday_count', models.IntegerField(default=0, verbose_name='公休')),
+                ('paid_leave_count', models.IntegerField(default=0, verbose_name='有給休暇')),
+                ('paid_leave_am_count', models.IntegerField(default=0, verbose_name='有給休暇(午前)')),
+                ('paid_leave_pm_count', models.IntegerField(default=0, verbose_name='有給休暇(午後)')),
+                ('absenteeism_count', models.IntegerField(default=0, verbose_name='欠勤')),
+                ('other_count', models.IntegerField(default=0, verbose_name='その他')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='shift_management.staff', verbose_name='スタッフ')),
+            ],
+            options={
+                'verbose_name': '月別集計',
+                'verbose_name_plural': '月別集計',
+                'ordering': ['month', 'staff'],
+                'indexes': [models.Index(fields=['month'], name='summary_month_idx')],
+                'unique_together': {('staff', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
 class Staff(models.Model):
@@ -28,6 +28,7 @@ class ShiftType(models.Model):
     start_time = models.TimeField(verbose_name="デフォルト開始時間")
     end_time = models.TimeField(verbose_name="デフォルト終了時間")
     description = models.TextField(blank=True, null=True, verbose_name="説明")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
 
     class Meta:
         verbose_name = "シフト種別"
@@ -71,6 +72,22 @@ class Shift(models.Model):
         verbose_name_plural = "シフト"
         ordering = ['date', 'start_time']
         # unique_together = ['staff', 'date', 'start_time']  # 事由登録でstart_timeがNullになるため一時的にコメントアウト
+        indexes = [
+            # 期間指定（カレンダー・API・時間チャート・エクスポート）。並び順も兼ねる
+            models.Index(fields=['date', 'start_time'], name='shift_date_idx'),
+            # スタッフ×日付（一括登録・テンプレート適用・事由登録）
+            models.Index(fields=['staff', 'date'], name='shift_staff_date_idx'),
+            # 事由付きシフトの除外・抽出と期間指定
+            models.Index(fields=['is_deleted_with_reason', 'date'], name='shift_reason_date_idx'),
+            # 差分同期（updated_at 以降の変更）
+            models.Index(fields=['updated_at'], name='shift_updated_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # 保存と post_save での月別集計の加減を同じトランザクションにする
+        # （削除は Collector が post_delete まで含めてトランザクションにしている）
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         if self.is_deleted_with_reason:
@@ -82,6 +99,20 @@ class Shift(models.Model):
             return f"{self.staff.name} - {self.date}{time_str}"
 
 
+class ShiftTombstone(models.Model):
+    """削除済みシフトの記録（api_shifts の差分同期用）"""
+    shift_id = models.BigIntegerField(verbose_name="シフトID")
+    date = models.DateField(verbose_name="日付")
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="削除日時")
+
+    class Meta:
+        verbose_name = "削除済みシフト"
+        verbose_name_plural = "削除済みシフト"
+
+    def __str__(self):
+        return f"{self.shift_id} - {self.date}"
+
+
 class ShiftTemplate(models.Model):
     """シフトテンプレートモデル"""
     name = models.CharField(max_length=100, verbose_name="テンプレート名")
@@ -123,4 +154,70 @@ class ShiftTemplateDetail(models.Model):
         unique_together = ['template', 'staff', 'weekday']
 
     def __str__(self):
-        return f"{self.template.name} - {self.staff.name} - {self.get_weekday_display()}" 
\ No newline at end of file
+        return f"{self.template.name} - {self.staff.name} - {self.get_weekday_display()}" 
+
+
+class ShiftJob(models.Model):
+    """一括処理ジョブ（リクエスト外でワーカーが実行する）"""
+    KIND_CHOICES = [
+        ('bulk_shift_create', 'シフト一括登録'),
+        ('template_apply', 'テンプレート適用'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', '待機中'),
+        ('running', '実行中'),
+        ('succeeded', '完了'),
+        ('failed', '失敗'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES, verbose_name="処理種別")
+    params = models.JSONField(default=dict, verbose_name="パラメータ")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name="状態")
+    progress_done = models.IntegerField(default=0, verbose_name="処理済み件数")
+    progress_total = models.IntegerField(default=0, verbose_name="全体件数")
+    result = models.JSONField(null=True, blank=True, verbose_name="結果")
+    error = models.TextField(blank=True, default='', verbose_name="エラー内容")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="作成日時")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="開始日時")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="終了日時")
+
+    class Meta:
+        verbose_name = "一括処理ジョブ"
+        verbose_name_plural = "一括処理ジョブ"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress_percent(self):
+        if not self.progress_total:
+            return 100 if self.status == 'succeeded' else 0
+        return int(self.progress_done * 100 / self.progress_total)
+
+
+class StaffMonthlySummary(models.Model):
+    """スタッフ別・月別の勤務時間と事由の件数（シフトの変更に合わせて signals.py で更新する）"""
+    staff = models.ForeignKey(Staff, on_delete=models.CASCADE, related_name='monthly_summaries', verbose_name="スタッフ")
+    month = models.DateField(verbose_name="月")  # 月の1日
+    scheduled_minutes = models.IntegerField(default=0, verbose_name="勤務予定時間（分）")
+    shift_count = models.IntegerField(default=0, verbose_name="シフト数")
+    public_holiday_count = models.IntegerField(default=0, verbose_name="公休")
+    paid_leave_count = models.IntegerField(default=0, verbose_name="有給休暇")
+    paid_leave_am_count = models.IntegerField(default=0, verbose_name="有給休暇(午前)")
+    paid_leave_pm_count = models.IntegerField(default=0, verbose_name="有給休暇(午後)")
+    absenteeism_count = models.IntegerField(default=0, verbose_name="欠勤")
+    other_count = models.IntegerField(default=0, verbose_name="その他")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    class Meta:
+        verbose_name = "月別集計"
+        verbose_name_plural = "月別集計"
+        ordering = ['month', 'staff']
+        unique_together = ['staff', 'month']
+        indexes = [
+            models.Index(fields=['month'], name='summary_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.staff_id} - {self.month:%Y-%m}"
@@ -0,0 +1,130 @@
+"""
+PDFエクスポートのディスクキャッシュ（内容アドレス方式）
+
+キーは「期間・対象スタッフ・期間内シフト／スタッフ／シフト種別のデータバージョン・
+テンプレートのバージョン」のハッシュ。データが変わればキーも変わるため、
+明示的な無効化は不要で、古いファイルは容量と経過時間で削除する。
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.template.loader import get_template
+
+from .models import Shift, ShiftType
+
+# PDF生成処理（exports.py）の出力を変えたら上げる
+PDF_FORMAT_VERSION = 1
+
+
+def cache_dir():
+    return Path(getattr(settings, 'SHIFT_PDF_CACHE_DIR', settings.BASE_DIR / 'cache' / 'pdf'))
+
+
+def _max_bytes():
+    return getattr(settings, 'SHIFT_PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+
+def _max_age():
+    return getattr(settings, 'SHIFT_PDF_CACHE_MAX_AGE', 60 * 60 * 24 * 7)
+
+
+@lru_cache(maxsize=None)
+def template_version(template_name, stylesheet):
+    """テンプレートのソースとスタイルシートから算出したバージョン"""
+    source = get_template(template_name).template.source
+    return hashlib.sha256(f'{PDF_FORMAT_VERSION}\n{source}\n{stylesheet}'.encode()).hexdigest()[:16]
+
+
+def _aggregate_version(queryset):
+    stats = queryset.order_by().aggregate(updated=Max('updated_at'), count=Count('id'))
+    return f"{stats['updated'].isoformat() if stats['updated'] else ''}/{stats['count']}"
+
+
+def export_key(staff_list, start_date, end_date, template_name, stylesheet):
+    """エクスポート内容を一意に表すキー（SHA-256）"""
+    staff_ids = sorted(staff_list.values_list('id', flat=True))
+    parts = [
+        start_date.isoformat(),
+        end_date.isoformat(),
+        ','.join(str(staff_id) for staff_id in staff_ids),
+        _aggregate_version(Shift.objects.filter(
+            date__range=[start_date, end_date], staff_id__in=staff_ids
+        )),
+        _aggregate_version(staff_list),
+        _aggregate_version(ShiftType.objects.all()),
+        template_version(template_name, stylesheet),
+    ]
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+def _path_for(key):
+    return cache_dir() / f'{key}.pdf'
+
+
+def get(key):
+    """キャッシュ済みPDFのパス（なければ None）。ヒット時は最終利用時刻を更新する"""
+    path = _path_for(key)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def put(key, pdf_bytes):
+    """PDFを保存してパスを返す（一時ファイルに書いてから置き換える）"""
+    directory = cache_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, _path_for(key))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    evict()
+    return _path_for(key)
+
+
+def evict(max_bytes=None, max_age=None):
+    """期限切れのファイルを削除し、合計容量が上限を超えていれば古い順に削除する
+
+    戻り値: 削除したファイル数
+    """
+    max_bytes = _max_bytes() if max_bytes is None else max_bytes
+    max_age = _max_age() if max_age is None else max_age
+    directory = cache_dir()
+    if not directory.exists():
+        return 0
+
+    now = time.time()
+    entries = []
+    removed = 0
+    for path in directory.glob('*.pdf'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if now - stat.st_mtime > max_age:
+            path.unlink(missing_ok=True)
+            removed += 1
+        else:
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,209 @@
+"""
+PDFレンダリング用プロセスプール
+
+WeasyPrintによるレイアウトはCPU負荷が高いため、リクエスト処理とは別の
+プロセスで実行する。同時に受け付ける件数には上限を設け、時間制限を超えた
+レンダリングは打ち切る。複数月にまたがる期間は月ごとにHTMLを分けて
+並列にレンダリングし、最後にページを連結する。
+
+プールはプロセスが常駐する場合（appserver.py の gunicorn）のみ使う。CGIで直接
+Djangoを起動した場合は1リクエストごとにプロセスが終わるため、SHIFT_PDF_POOL=False
+としてリクエストのプロセス内でレンダリングする（django.cgi が設定する）。
+同時に受け付ける件数（SHIFT_PDF_MAX_PENDING）は、SHIFT_PDF_SLOT_DIR のロック
+ファイルで数えるため、全プロセスの合計に対する上限になる。
+"""
+
+import atexit
+import datetime
+import os
+import threading
+from concurrent.futures import FIRST_EXCEPTION, wait
+from pathlib import Path
+
+from django.conf import settings
+
+from . import pdf_worker
+from .event_cache import iter_months, next_month
+
+try:
+    import fcntl
+except ImportError:  # Windows（ローカル開発）ではプロセス内でのみ数える
+    fcntl = None
+
+_pool = None
+_pool_lock = threading.Lock()
+_local_slots = None
+
+
+class PdfRenderError(Exception):
+    """PDFレンダリングに失敗した"""
+
+
+class PdfRenderBusy(PdfRenderError):
+    """レンダリング待ちが上限に達している"""
+
+
+class PdfRenderTimeout(PdfRenderError):
+    """レンダリングが時間内に終わらなかった"""
+
+
+def _workers():
+    return getattr(settings, 'SHIFT_PDF_WORKERS', None) or os.cpu_count() or 1
+
+
+def _timeout():
+    return getattr(settings, 'SHIFT_PDF_RENDER_TIMEOUT', 120)
+
+
+def _max_pending():
+    return getattr(settings, 'SHIFT_PDF_MAX_PENDING', 4)
+
+
+def use_pool():
+    return getattr(settings, 'SHIFT_PDF_POOL', True)
+
+
+class _Pool:
+    """プロセスプールと、それを使用中のリクエスト数"""
+
+    def __init__(self):
+        # multiprocessing 一式はPDFを作るときだけ読み込む
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.executor = ProcessPoolExecutor(max_workers=_workers())
+        self.users = 0
+        self.retired = False
+
+    def terminate(self):
+        for process in list((getattr(self.executor, '_processes', None) or {}).values()):
+            process.terminate()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _acquire_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _Pool()
+        _pool.users += 1
+        return _pool
+
+
+def _release_pool(pool, retire=False):
+    """使用を終える。retire なら以降のリクエストには新しいプールを使わせる
+
+    時間切れのレンダリングを止めるためにプロセスを終了させるのは、
+    同じプールを使っている他のリクエストがすべて終わってからにする。
+    """
+    global _pool
+    with _pool_lock:
+        pool.users -= 1
+        if retire:
+            pool.retired = True
+            if _pool is pool:
+                _pool = None
+        terminate = pool.retired and pool.users == 0
+    if terminate:
+        pool.terminate()
+
+
+def shutdown():
+    """プールを終了する（プロセス終了時に呼ばれる）"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.executor.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown)
+
+
+def _slot_dir():
+    return Path(getattr(settings, 'SHIFT_PDF_SLOT_DIR', settings.BASE_DIR / 'run'))
+
+
+def _acquire_slot():
+    """レンダリングの枠を1つ確保し、解放用の関数を返す（空きがなければ None）"""
+    global _local_slots
+    if fcntl is None:
+        with _pool_lock:
+            if _local_slots is None:
+                _local_slots = threading.BoundedSemaphore(_max_pending())
+        return _local_slots.release if _local_slots.acquire(blocking=False) else None
+
+    directory = _slot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    for index in range(_max_pending()):
+        # flock はプロセスが終了すれば解放されるため、異常終了しても枠は残らない
+        lock_file = open(directory / f'pdf-slot-{index}.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        return lock_file.close
+    return None
+
+
+def _render_in_pool(html_parts, stylesheet):
+    pool = _acquire_pool()
+    timed_out = False
+    try:
+        futures = [pool.executor.submit(pdf_worker.render_pdf, html, stylesheet) for html in html_parts]
+        done, not_done = wait(futures, timeout=_timeout(), return_when=FIRST_EXCEPTION)
+        if not_done:
+            for future in not_done:
+                future.cancel()
+            failed = [future for future in done if future.exception() is not None]
+            if failed:
+                raise PdfRenderError(f'PDFの作成に失敗しました: {failed[0].exception()}')
+            timed_out = True
+            raise PdfRenderTimeout('PDFの作成が時間内に終わりませんでした。期間を短くして再度お試しください。')
+        try:
+            return [future.result() for future in futures]
+        except Exception as e:
+            raise PdfRenderError(f'PDFの作成に失敗しました: {e}') from e
+    finally:
+        _release_pool(pool, retire=timed_out)
+
+
+def _render_in_process(html_parts, stylesheet):
+    try:
+        return [pdf_worker.render_pdf(html, stylesheet) for html in html_parts]
+    except Exception as e:
+        raise PdfRenderError(f'PDFの作成に失敗しました: {e}') from e
+
+
+def can_merge():
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def split_by_month(start_date, end_date):
+    """期間を月ごとの (開始日, 終了日) に分割する"""
+    return [
+        (max(start_date, month), min(end_date, next_month(month) - datetime.timedelta(days=1)))
+        for month in iter_months(start_date, end_date)
+    ]
+
+
+def render_parts(html_parts, stylesheet):
+    """HTMLの断片をPDF化し（プールを使う場合は並列）、ページを連結したPDF（bytes）を返す"""
+    release = _acquire_slot()
+    if release is None:
+        raise PdfRenderBusy('PDFの作成が混み合っています。しばらくしてから再度お試しください。')
+    try:
+        if use_pool():
+            parts = _render_in_pool(html_parts, stylesheet)
+        else:
+            parts = _render_in_process(html_parts, stylesheet)
+    finally:
+        release()
+
+    if len(parts) == 1:
+        return parts[0]
+    return pdf_worker.merge_pdfs(parts)
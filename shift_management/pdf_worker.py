@@ -0,0 +1,27 @@
+"""
+PDFレンダリングの実処理（レンダリング用プロセスで実行される）
+
+子プロセスで import されてもDjangoの初期化を必要としないよう、
+このモジュールはWeasyPrint以外に依存しない。
+"""
+
+import io
+
+
+def render_pdf(html_string, stylesheet):
+    """HTML文字列をPDF（bytes）に変換"""
+    from weasyprint import HTML, CSS
+
+    return HTML(string=html_string).write_pdf(stylesheets=[CSS(string=stylesheet)])
+
+
+def merge_pdfs(parts):
+    """複数のPDF（bytes）をページ順に連結する（pypdf が必要）"""
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(io.BytesIO(part))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
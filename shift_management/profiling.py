@@ -0,0 +1,161 @@
+"""
+リクエスト単位のプロファイル（cProfile）の保存
+
+ProfileMiddleware がスタッフユーザーのリクエストのうち、クエリ文字列 ?_profile=1 または
+X-Shift-Profile ヘッダーが付いたものだけを cProfile で計測し、ここに保存する。
+ヘッダーの値には make_token() で発行した署名付きトークンも使える（セッションのない
+curl 等からの計測用。トークンのユーザーがスタッフであれば有効）。
+
+保存先は SHIFT_PROFILE_DIR（既定: logs/ と同じ階層の profiles/）。1件ごとに
+pstats 形式の .prof と、URL・パラメータ等を記録した .json を書き、
+SHIFT_PROFILE_MAX_FILES 件を超えたら古いものから削除する。
+"""
+
+import datetime
+import io
+import json
+import os
+import pstats
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+QUERY_FLAG = '_profile'
+HEADER = 'X-Shift-Profile'
+TOKEN_SALT = 'shift_management.profiling'
+
+# 記録しないパラメータ
+SKIPPED_PARAMS = {'csrfmiddlewaretoken', QUERY_FLAG}
+
+# 値を伏せて名前だけ記録するパラメータ（ログイン・パスワード変更フォーム等）
+SENSITIVE_PARAM = re.compile(r'pass|token|secret|key', re.IGNORECASE)
+REDACTED = '********'
+
+
+def profile_dir():
+    return Path(getattr(settings, 'SHIFT_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def _max_files():
+    return getattr(settings, 'SHIFT_PROFILE_MAX_FILES', 50)
+
+
+def make_token(username):
+    """X-Shift-Profile ヘッダーに使う署名付きトークン"""
+    return signing.dumps(username, salt=TOKEN_SALT, compress=True)
+
+
+def _token_user(token):
+    try:
+        username = signing.loads(
+            token, salt=TOKEN_SALT, max_age=getattr(settings, 'SHIFT_PROFILE_TOKEN_MAX_AGE', 60 * 60)
+        )
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(username=username, is_active=True, is_staff=True).first()
+
+
+def requested_by(request):
+    """プロファイルを要求したスタッフユーザー名（対象外のリクエストは None）"""
+    header = request.headers.get(HEADER)
+    if not header and request.GET.get(QUERY_FLAG) != '1':
+        return None
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return user.get_username()
+    if header and header != '1':
+        token_user = _token_user(header)
+        if token_user is not None:
+            return token_user.get_username()
+    return None
+
+
+def _params(querydict):
+    return {
+        key: [REDACTED] * len(querydict.getlist(key)) if SENSITIVE_PARAM.search(key) else querydict.getlist(key)
+        for key in querydict if key not in SKIPPED_PARAMS
+    }
+
+
+def save(profiler, request, response, username, elapsed):
+    """プロファイルとリクエストの情報を保存し、ファイル名（拡張子なし）を返す"""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    match = request.resolver_match
+    view_name = match.view_name if match else 'unknown'
+    now = datetime.datetime.now().astimezone()
+    # 名前は時刻で始め、名前順が保存順になるようにする
+    stamp = now.strftime('%Y%m%d-%H%M%S-%f')
+    name = f'{stamp}-{re.sub(r"[^A-Za-z0-9_]+", "_", view_name)}-{os.getpid()}'
+
+    profiler.dump_stats(directory / f'{name}.prof')
+    meta = {
+        'name': name,
+        'profiled_at': now.isoformat(timespec='seconds'),
+        'user': username,
+        'method': request.method,
+        'path': request.path,
+        'view_name': view_name,
+        'get': _params(request.GET),
+        'post': _params(request.POST) if request.method == 'POST' else {},
+        'status': response.status_code,
+        'elapsed_ms': round(elapsed * 1000, 1),
+    }
+    with open(directory / f'{name}.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    prune(_max_files())
+    return name
+
+
+def list_profiles():
+    """保存済みプロファイルの情報（新しい順）"""
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    entries = []
+    for path in directory.glob('*.json'):
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(entries, key=lambda meta: meta.get('name', ''), reverse=True)
+
+
+def prune(keep=None, older_than=None):
+    """新しい keep 件を残し、older_than 秒より古いものも削除する
+
+    戻り値: 削除したプロファイル数
+    """
+    directory = profile_dir()
+    if not directory.exists():
+        return 0
+    now = time.time()
+    names = sorted({path.stem for path in directory.glob('*.prof')}, reverse=True)
+    removed = 0
+    for index, name in enumerate(names):
+        prof = directory / f'{name}.prof'
+        try:
+            expired = older_than is not None and now - prof.stat().st_mtime > older_than
+        except FileNotFoundError:
+            continue
+        if (keep is not None and index >= keep) or expired:
+            prof.unlink(missing_ok=True)
+            (directory / f'{name}.json').unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def summarize(name, limit=20, sort='cumulative'):
+    """プロファイルの上位 limit 関数を pstats の表形式で返す"""
+    path = profile_dir() / f'{name}.prof'
+    if not path.exists():
+        raise FileNotFoundError(path)
+    out = io.StringIO()
+    stats = pstats.Stats(str(path), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,84 @@
+"""
+スタッフ×日付のシフト表（スケジュールマトリクス）
+
+シフトを (staff_id, date) をキーに1パスで索引化し、
+カレンダー・エクスポートなどのグリッド表示で共通利用する。
+索引はアクセスされた時点で初めて構築される（遅延評価）。
+"""
+
+import datetime
+from collections import defaultdict
+from functools import cached_property
+
+
+def iter_dates(start_date, end_date):
+    """開始日から終了日まで（両端含む）の日付を順に返す"""
+    current_date = start_date
+    while current_date <= end_date:
+        yield current_date
+        current_date += datetime.timedelta(days=1)
+
+
+class ScheduleMatrix:
+    """(staff_id, date) 単位でシフトを引けるスケジュール表
+
+    shifts にはクエリセットをそのまま渡してよい。
+    cells / days() / rows() のいずれかに触れるまでクエリは発行されない。
+    """
+
+    def __init__(self, shifts, start_date, end_date, staff_list=None):
+        self._shifts = shifts
+        self._staff_list = staff_list
+        self.start_date = start_date
+        self.end_date = end_date
+
+    @cached_property
+    def dates(self):
+        """表示対象の日付リスト"""
+        return list(iter_dates(self.start_date, self.end_date))
+
+    @cached_property
+    def staff_list(self):
+        """表示対象のスタッフ（評価済みリスト）"""
+        return list(self._staff_list) if self._staff_list is not None else []
+
+    @cached_property
+    def cells(self):
+        """{(staff_id, date): [shift, ...]} の索引（1パスで構築）"""
+        index = defaultdict(list)
+        for shift in self._shifts:
+            index[(shift.staff_id, shift.date)].append(shift)
+        return dict(index)
+
+    def get(self, staff_id, date):
+        """指定スタッフ・日付のシフト一覧（なければ空リスト）"""
+        return self.cells.get((staff_id, date), [])
+
+    def days(self):
+        """日付ごとの行: [{'date', 'weekday', 'staff_shifts': [{'staff', 'shifts'}]}]"""
+        cells = self.cells
+        return [
+            {
+                'date': date,
+                'weekday': date.weekday(),
+                'staff_shifts': [
+                    {'staff': staff, 'shifts': cells.get((staff.id, date), [])}
+                    for staff in self.staff_list
+                ],
+            }
+            for date in self.dates
+        ]
+
+    def rows(self):
+        """スタッフごとの行: [{'staff', 'cells': [[shift, ...] (日付順)]}]"""
+        cells = self.cells
+        return [
+            {
+                'staff': staff,
+                'cells': [cells.get((staff.id, date), []) for date in self.dates],
+            }
+            for staff in self.staff_list
+        ]
+
+    def __iter__(self):
+        return iter(self.days())
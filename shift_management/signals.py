@@ -0,0 +1,192 @@
+"""
+モデル変更時のシグナルハンドラ
+
+イベントキャッシュ（event_cache）を影響のある月だけ無効化し、
+シフトの削除を差分同期用に記録する。スタッフ別・月別の集計（summaries）も更新する。
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import event_cache, summaries
+from .models import Shift, ShiftTombstone, ShiftType, Staff
+
+
+_local = threading.local()
+
+
+class ShiftChangeBatch:
+    """一括処理中のシフト変更を溜めておき、最後にまとめて反映する"""
+
+    def __init__(self):
+        self.dates = set()
+        self.tombstones = []
+
+    def touch(self, dates):
+        """変更のあった日付を登録（bulk_create/bulk_update などシグナルのない更新用）"""
+        self.dates.update(dates)
+
+    def record_deletions(self, rows):
+        """シグナルを通さずに削除するシフトの (ID, 日付) を登録"""
+        for shift_id, date in rows:
+            self.dates.add(date)
+            self.tombstones.append(ShiftTombstone(shift_id=shift_id, date=date))
+
+    def flush(self):
+        if self.tombstones:
+            ShiftTombstone.objects.bulk_create(self.tombstones, batch_size=500)
+        dates = list(self.dates)
+        # 月別集計は行ごとに加減せず、変更のあった月を作り直す
+        summaries.rebuild({summaries.month_of(date) for date in dates if date is not None})
+        _invalidate_on_commit(dates)
+
+
+@contextmanager
+def deferred_shift_changes():
+    """ブロック内のシフト変更に伴う削除記録・キャッシュ無効化を1回にまとめる
+
+    行ごとのINSERTやキャッシュ削除を避けるため、一括登録・一括更新で使う。
+    トランザクション内で使うこと（削除記録は同じトランザクションで保存される）。
+    """
+    if getattr(_local, 'batch', None) is not None:
+        # 入れ子の場合は外側のバッチに合流
+        yield _local.batch
+        return
+    batch = _local.batch = ShiftChangeBatch()
+    try:
+        yield batch
+    finally:
+        _local.batch = None
+    batch.flush()
+
+
+def _current_batch():
+    return getattr(_local, 'batch', None)
+
+
+def _invalidate_on_commit(dates):
+    # コミット前に無効化すると、同時に来た api_shifts がコミット前のデータで
+    # その月を作り直してしまうため、コミット後に無効化する
+    transaction.on_commit(lambda: event_cache.invalidate_months(dates))
+
+
+def _remember(instance, fields):
+    # 遅延ロードを起こさないよう __dict__ から読み取る
+    instance._original_values = {name: instance.__dict__.get(name) for name in fields}
+
+
+def _changed(instance, fields):
+    original = getattr(instance, '_original_values', {})
+    return any(original.get(name) != getattr(instance, name) for name in fields)
+
+
+def _shift_months(**filters):
+    """条件に合うシフトが存在する月（各月1日）の一覧"""
+    return list(Shift.objects.filter(**filters).order_by().dates('date', 'month'))
+
+
+# --- シフト ---
+
+def _shift_value(name, value):
+    # Shift.objects.create(start_time='09:00') のように文字列で代入された値はフィールドの型にする
+    if isinstance(value, str):
+        return Shift._meta.get_field(name).to_python(value)
+    return value
+
+
+def _summary_before(instance):
+    """読み込み時（または前回の保存時）の集計への寄与分"""
+    original = getattr(instance, '_original_values', {})
+    return summaries.contribution(*(_shift_value(name, original.get(name)) for name in summaries.SHIFT_FIELDS))
+
+
+def _summary_after(instance):
+    return summaries.contribution(*(_shift_value(name, getattr(instance, name)) for name in summaries.SHIFT_FIELDS))
+
+
+def _partially_loaded(instance):
+    # only()/defer() で読み込んだ場合は変更前の値が分からない
+    return bool(instance.get_deferred_fields() & set(summaries.SHIFT_FIELDS))
+
+
+@receiver(post_init, sender=Shift)
+def remember_shift_values(sender, instance, **kwargs):
+    _remember(instance, summaries.SHIFT_FIELDS)
+
+
+@receiver(post_save, sender=Shift)
+def invalidate_shift_on_save(sender, instance, created, **kwargs):
+    # 日付が移動した場合は移動元の月も無効化する
+    original = getattr(instance, '_original_values', {})
+    dates = [_shift_value('date', instance.date), _shift_value('date', original.get('date'))]
+    batch = _current_batch()
+    if batch is not None:
+        batch.touch(dates)
+    else:
+        _invalidate_on_commit(dates)
+        if created:
+            summaries.adjust(None, _summary_after(instance))
+        elif _partially_loaded(instance):
+            summaries.rebuild({summaries.month_of(date) for date in dates if date is not None})
+        else:
+            summaries.adjust(_summary_before(instance), _summary_after(instance))
+    _remember(instance, summaries.SHIFT_FIELDS)
+
+
+@receiver(post_delete, sender=Shift)
+def invalidate_shift_on_delete(sender, instance, **kwargs):
+    date = _shift_value('date', instance.date)
+    batch = _current_batch()
+    if batch is not None:
+        batch.record_deletions([(instance.pk, date)])
+        return
+    _invalidate_on_commit([date])
+    if _partially_loaded(instance):
+        summaries.rebuild([summaries.month_of(date)])
+    else:
+        summaries.adjust(_summary_before(instance), None)
+    # 差分同期のために削除を記録する
+    ShiftTombstone.objects.create(shift_id=instance.pk, date=date)
+
+
+# --- スタッフ（イベントのタイトルに名前が含まれる） ---
+
+@receiver(post_init, sender=Staff)
+def remember_staff_name(sender, instance, **kwargs):
+    _remember(instance, ['name'])
+
+
+@receiver(post_save, sender=Staff)
+def invalidate_staff_on_save(sender, instance, created, **kwargs):
+    if not created and _changed(instance, ['name']):
+        _invalidate_on_commit(_shift_months(staff=instance))
+    _remember(instance, ['name'])
+
+
+# --- シフト種別（名前と表示色がイベントに含まれる） ---
+
+@receiver(post_init, sender=ShiftType)
+def remember_shift_type_display(sender, instance, **kwargs):
+    _remember(instance, ['name', 'color'])
+
+
+@receiver(post_save, sender=ShiftType)
+def invalidate_shift_type_on_save(sender, instance, created, **kwargs):
+    if not created and _changed(instance, ['name', 'color']):
+        _invalidate_on_commit(_shift_months(shift_type=instance))
+    _remember(instance, ['name', 'color'])
+
+
+@receiver(pre_delete, sender=ShiftType)
+def collect_shift_type_months(sender, instance, **kwargs):
+    # 削除時は SET_NULL で参照が消えるため、削除前に対象月を確定させておく
+    instance._affected_months = _shift_months(shift_type=instance)
+
+
+@receiver(post_delete, sender=ShiftType)
+def invalidate_shift_type_on_delete(sender, instance, **kwargs):
+    _invalidate_on_commit(getattr(instance, '_affected_months', []))
@@ -0,0 +1,155 @@
+"""
+時間帯別の勤務人数（スタッフィングカーブ）
+
+各シフトを「開始スロットで+1、終了スロットで-1」のイベントに変換して差分配列に積み、
+累積和で日ごとの人数の推移を求める。シフト数をn、日数×スロット数をmとしてO(n + m)。
+終了時刻は含まない（17:00終了のシフトは17:00からのスロットに数えない）。
+差分配列は期間の前日から翌日までを1本の時間軸にしたもので、日をまたぐシフトは翌日の分も数える。
+"""
+
+import datetime
+from functools import cached_property
+from itertools import accumulate
+
+from .schedule import iter_dates
+
+MINUTES_PER_DAY = 24 * 60
+
+# 選択できる集計単位（分）
+RESOLUTIONS = (5, 15, 30, 60)
+DEFAULT_RESOLUTION = 30
+
+
+def to_minutes(value):
+    """datetime.time を0:00からの分に変換"""
+    return value.hour * 60 + value.minute
+
+
+def minutes_label(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class StaffingCurve:
+    """期間内の日ごと・スロットごとの勤務人数
+
+    intervals は (日付, 開始分, 終了分) の並び。スロットに少しでも重なるシフトは
+    そのスロットの人数に含める。終了が開始より前のシフト（日をまたぐ勤務）は翌日の終了時刻まで数える。
+    期間の初日に人数を数えるため、intervals には前日に始まるシフトも含めてよい。
+    """
+
+    def __init__(self, intervals, start_date, end_date, resolution=DEFAULT_RESOLUTION):
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f'resolution must be one of {RESOLUTIONS}')
+        self.resolution = resolution
+        self.slots = MINUTES_PER_DAY // resolution
+        self.dates = list(iter_dates(start_date, end_date))
+
+        # 行0が前日、行 len(dates)+1 が翌日（日をまたぐシフトの続きを受ける）
+        first_day = start_date - datetime.timedelta(days=1)
+        days = len(self.dates) + 2
+        diff = [0] * (days * self.slots + 1)
+        for date, start, end in intervals:
+            row = (date - first_day).days
+            if not 0 <= row < days or start == end:
+                continue
+            if end < start:
+                end += MINUTES_PER_DAY
+            offset = row * self.slots
+            diff[offset + start // resolution] += 1
+            diff[min(offset + -(-end // resolution), len(diff) - 1)] -= 1
+
+        counts = list(accumulate(diff[:-1]))
+        self.curves = {
+            date: counts[row * self.slots:(row + 1) * self.slots]
+            for row, date in enumerate(self.dates, start=1)
+        }
+
+    @classmethod
+    def from_shifts(cls, shift_times, start_date, end_date, resolution=DEFAULT_RESOLUTION):
+        """(日付, 開始時刻, 終了時刻) の並びから作成（時刻のないシフトは除く）
+
+        shift_times は期間の前日の分から渡すと、前日からの夜勤も初日に数える。
+        """
+        intervals = (
+            (date, to_minutes(start_time), to_minutes(end_time))
+            for date, start_time, end_time in shift_times
+            if start_time is not None and end_time is not None
+        )
+        return cls(intervals, start_date, end_date, resolution)
+
+    def slot_label(self, slot):
+        return minutes_label(slot * self.resolution)
+
+    def day(self, date):
+        """指定日のスロットごとの人数"""
+        return self.curves.get(date) or [0] * self.slots
+
+    @cached_property
+    def totals(self):
+        """スロットごとの人数の期間合計"""
+        return [sum(column) for column in zip(*self.curves.values())] or [0] * self.slots
+
+    @cached_property
+    def maximum(self):
+        """スロットごとの期間中の最大人数"""
+        return [max(column) for column in zip(*self.curves.values())] or [0] * self.slots
+
+    @cached_property
+    def average(self):
+        """スロットごとの1日あたり平均人数"""
+        days = len(self.dates) or 1
+        return [total / days for total in self.totals]
+
+    def _periods(self, target, first, last):
+        """first〜last のスロットのうち、期間合計が target のスロットが連続する区間"""
+        periods = []
+        run_start = None
+        for slot in range(first, last + 2):
+            hit = slot <= last and self.totals[slot] == target
+            if hit and run_start is None:
+                run_start = slot
+            elif not hit and run_start is not None:
+                periods.append({
+                    'start': self.slot_label(run_start),
+                    'end': minutes_label(slot * self.resolution),
+                    'average': round(target / (len(self.dates) or 1), 1),
+                })
+                run_start = None
+        return periods
+
+    @cached_property
+    def staffed_span(self):
+        """誰かが勤務しているスロットの最初と最後（いなければ None）"""
+        staffed = [slot for slot, total in enumerate(self.totals) if total]
+        return (staffed[0], staffed[-1]) if staffed else None
+
+    def peaks(self):
+        """平均人数が最も多い時間帯（連続するスロットはまとめる）"""
+        if self.staffed_span is None:
+            return []
+        return self._periods(max(self.totals), 0, self.slots - 1)
+
+    def troughs(self):
+        """勤務のある時間帯のうち、平均人数が最も少ない時間帯"""
+        if self.staffed_span is None:
+            return []
+        first, last = self.staffed_span
+        return self._periods(min(self.totals[first:last + 1]), first, last)
+
+    def summary(self, start_minute=0, end_minute=MINUTES_PER_DAY):
+        """表示用: 指定時間帯のスロットごとの {'label', 'average', 'maximum', 'level'}
+
+        level は平均人数を四捨五入した人数（色分け用）。
+        """
+        first = start_minute // self.resolution
+        last = min(-(-end_minute // self.resolution), self.slots)
+        average = self.average
+        return [
+            {
+                'label': self.slot_label(slot),
+                'average': round(average[slot], 1),
+                'maximum': self.maximum[slot],
+                'level': round(average[slot]),
+            }
+            for slot in range(first, last)
+        ]
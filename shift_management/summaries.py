@@ -0,0 +1,204 @@
+"""
+スタッフ別・月別の集計（StaffMonthlySummary）
+
+1件のシフトの保存・削除では、変更前後の寄与分（勤務時間・シフト数・事由の件数）を
+該当する (スタッフ, 月) の行に F式で加減する（signals.py から呼ぶ）。
+一括処理（deferred_shift_changes）では、変更のあった月をまとめて rebuild() で作り直す。
+シグナルを通らない更新によるずれは rebuild_staff_summaries コマンドで補正する。
+"""
+
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Shift, StaffMonthlySummary
+
+# 事由コード → 件数のフィールド名
+REASON_FIELDS = {code: f'{code}_count' for code, _ in Shift.DELETION_REASON_CHOICES}
+
+# 集計表の事由の列: (フィールド名, 見出し)
+REASON_COLUMNS = [(f'{code}_count', label) for code, label in Shift.DELETION_REASON_CHOICES]
+
+COUNT_FIELDS = ['scheduled_minutes', 'shift_count', *REASON_FIELDS.values()]
+
+SHIFT_FIELDS = ['staff_id', 'date', 'start_time', 'end_time', 'is_deleted_with_reason', 'deletion_reason']
+
+
+def month_of(date):
+    return date.replace(day=1)
+
+
+def shift_minutes(start_time, end_time):
+    """勤務時間（分）。終了が開始以前なら日をまたぐシフトとみなす"""
+    if start_time is None or end_time is None:
+        return 0
+    start = start_time.hour * 60 + start_time.minute
+    end = end_time.hour * 60 + end_time.minute
+    if end <= start:
+        end += 24 * 60
+    return end - start
+
+
+def contribution(staff_id, date, start_time, end_time, is_deleted_with_reason, deletion_reason):
+    """1件のシフトの寄与分: ((スタッフID, 月), {フィールド: 値})（日付・スタッフがなければ None）"""
+    if staff_id is None or date is None:
+        return None
+    if is_deleted_with_reason:
+        field = REASON_FIELDS.get(deletion_reason, REASON_FIELDS['other'])
+        counts = {field: 1}
+    else:
+        counts = {'shift_count': 1, 'scheduled_minutes': shift_minutes(start_time, end_time)}
+    return (staff_id, month_of(date)), counts
+
+
+def _apply(key, counts, sign):
+    staff_id, month = key
+    updates = {field: F(field) + sign * value for field, value in counts.items() if value}
+    if not updates:
+        return
+    updated = StaffMonthlySummary.objects.filter(staff_id=staff_id, month=month).update(**updates)
+    if not updated and sign > 0:
+        # 行がなければ作成する（同時に作成された場合は加算し直す）
+        _, created = StaffMonthlySummary.objects.get_or_create(staff_id=staff_id, month=month, defaults=counts)
+        if not created:
+            StaffMonthlySummary.objects.filter(staff_id=staff_id, month=month).update(**updates)
+
+
+def adjust(before, after):
+    """変更前後の寄与分（contribution() の戻り値、なければ None）の差を反映する"""
+    if before == after:
+        return
+    if before is not None:
+        _apply(*before, sign=-1)
+    if after is not None:
+        _apply(*after, sign=1)
+
+
+def compute(months=None):
+    """シフトから集計し直した {(スタッフID, 月): {フィールド: 値}}（months を指定すればその月だけ）"""
+    shifts = Shift.objects.order_by()
+    if months is not None:
+        months = sorted(set(months))
+        if not months:
+            return {}
+        last = months[-1]
+        end = (last + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
+        shifts = shifts.filter(date__range=[months[0], end])
+
+    totals = defaultdict(lambda: dict.fromkeys(COUNT_FIELDS, 0))
+    for row in shifts.values_list(*SHIFT_FIELDS).iterator(chunk_size=2000):
+        result = contribution(*row)
+        if result is None:
+            continue
+        key, counts = result
+        if months is not None and key[1] not in months:
+            continue
+        for field, value in counts.items():
+            totals[key][field] += value
+    return totals
+
+
+def _stored(months=None):
+    summaries = StaffMonthlySummary.objects.order_by()
+    if months is not None:
+        summaries = summaries.filter(month__in=months)
+    return {
+        (row[0], row[1]): dict(zip(COUNT_FIELDS, row[2:]))
+        for row in summaries.values_list('staff_id', 'month', *COUNT_FIELDS)
+    }
+
+
+def drift(months=None):
+    """保存済みの集計と、シフトから集計し直した値の差分 [(スタッフID, 月, 保存値, 正しい値)]"""
+    expected = compute(months)
+    stored = _stored(sorted(set(months)) if months is not None else None)
+    empty = dict.fromkeys(COUNT_FIELDS, 0)
+    return [
+        (key[0], key[1], stored.get(key, empty), expected.get(key, empty))
+        for key in sorted(set(expected) | set(stored))
+        if stored.get(key, empty) != expected.get(key, empty)
+    ]
+
+
+def rebuild(months=None):
+    """集計を作り直す（months を指定すればその月だけ）。戻り値: 集計し直した行数
+
+    既存の行を select_for_update でロックしてから集計し、変わった行だけを更新する
+    （行を作り直さないため、ロック待ちの adjust() の加減も更新後の行に反映される）。
+    """
+    months = sorted(set(months)) if months is not None else None
+    if months == []:
+        return 0
+    # 一括処理のトランザクション内から呼ばれることが多いため、セーブポイントは作らない
+    with transaction.atomic(savepoint=False):
+        summaries = StaffMonthlySummary.objects.order_by()
+        if months is not None:
+            summaries = summaries.filter(month__in=months)
+        stored = {
+            (row[1], row[2]): (row[0], dict(zip(COUNT_FIELDS, row[3:])))
+            for row in summaries.select_for_update().values_list('pk', 'staff_id', 'month', *COUNT_FIELDS)
+        }
+        totals = compute(months)
+
+        now = timezone.now()
+        changed = [
+            StaffMonthlySummary(pk=stored[key][0], updated_at=now, **counts)
+            for key, counts in totals.items() if key in stored and stored[key][1] != counts
+        ]
+        StaffMonthlySummary.objects.bulk_update(changed, [*COUNT_FIELDS, 'updated_at'], batch_size=1000)
+        StaffMonthlySummary.objects.bulk_create(
+            [StaffMonthlySummary(staff_id=staff_id, month=month, **counts)
+             for (staff_id, month), counts in totals.items() if (staff_id, month) not in stored],
+            batch_size=1000,
+        )
+        stale = [pk for key, (pk, _) in stored.items() if key not in totals]
+        if stale:
+            StaffMonthlySummary.objects.filter(pk__in=stale).delete()
+    return len(totals)
+
+
+def minutes_to_hours(minutes):
+    return round(minutes / 60, 1)
+
+
+def year_report(year, staff_list):
+    """年間の集計表
+
+    戻り値: {'rows': [{'staff', 'months': [12か月分の {'hours', 'shift_count'} または None],
+    'hours', 'totals': {フィールド: 年間合計}, 'reasons': [REASON_COLUMNS 順の件数]}],
+    'month_hours': [12か月分の全スタッフ合計時間]}
+    """
+    found = defaultdict(dict)
+    for summary in StaffMonthlySummary.objects.filter(
+        month__range=[datetime.date(year, 1, 1), datetime.date(year, 12, 31)], staff__in=staff_list
+    ).order_by():
+        found[summary.staff_id][summary.month.month] = summary
+
+    rows = []
+    month_minutes = [0] * 12
+    for staff in staff_list:
+        months = []
+        totals = dict.fromkeys(COUNT_FIELDS, 0)
+        for month in range(1, 13):
+            summary = found[staff.id].get(month)
+            if summary is None:
+                months.append(None)
+                continue
+            for field in COUNT_FIELDS:
+                totals[field] += getattr(summary, field)
+            month_minutes[month - 1] += summary.scheduled_minutes
+            months.append({
+                'hours': minutes_to_hours(summary.scheduled_minutes),
+                'shift_count': summary.shift_count,
+            })
+        rows.append({
+            'staff': staff,
+            'months': months,
+            'hours': minutes_to_hours(totals['scheduled_minutes']),
+            'totals': totals,
+            'reasons': [totals[field] for field, _ in REASON_COLUMNS],
+        })
+    return {'rows': rows, 'month_hours': [minutes_to_hours(minutes) for minutes in month_minutes]}
@@ -0,0 +1,137 @@
+"""
+性能計測用の合成データ
+
+スタッフ・シフト種別・テンプレート・シフト（事由付きを含む）を指定した規模で作成する。
+同じ seed なら同じデータになる。名前には SYNTHETIC_PREFIX を付け、後から削除できるようにする。
+"""
+
+import datetime
+import random
+
+from dateutil.relativedelta import relativedelta
+from django.db import connection, transaction
+
+from .models import Shift, ShiftTemplate, ShiftTemplateDetail, ShiftType, Staff
+from .schedule import iter_dates
+from .signals import deferred_shift_changes
+
+SYNTHETIC_PREFIX = '[合成]'
+
+BATCH_SIZE = 2000
+
+# シフト種別の雛形: (名前, 色, 開始時, 終了時)
+SHIFT_TYPE_PATTERNS = [
+    ('早番', '#3498db', 7, 16),
+    ('日勤', '#2ecc71', 9, 18),
+    ('遅番', '#e67e22', 13, 22),
+    ('夜勤', '#8e44ad', 22, 7),
+    ('短時間', '#1abc9c', 10, 15),
+    ('午前', '#f1c40f', 8, 12),
+    ('午後', '#e74c3c', 13, 17),
+]
+
+REASONS = [code for code, _ in Shift.DELETION_REASON_CHOICES]
+
+
+def _create(model, objs):
+    """作成して主キー付きのリストを返す（bulk_create で主キーが返らないDBでは1件ずつ保存）"""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs)
+    for obj in objs:
+        obj.save()
+    return objs
+
+
+def _shift_types(count):
+    shift_types = []
+    for i in range(count):
+        name, color, start_hour, end_hour = SHIFT_TYPE_PATTERNS[i % len(SHIFT_TYPE_PATTERNS)]
+        shift_types.append(ShiftType(
+            name=f'{SYNTHETIC_PREFIX}{name}{i // len(SHIFT_TYPE_PATTERNS) + 1}',
+            color=color,
+            start_time=datetime.time(start_hour),
+            end_time=datetime.time(end_hour),
+        ))
+    return _create(ShiftType, shift_types)
+
+
+def _shifts(staff_list, shift_types, start_date, end_date, work_rate, reason_rate, rng):
+    """1日ごと・スタッフごとに、出勤率 work_rate・事由率 reason_rate でシフトを作る"""
+    for date in iter_dates(start_date, end_date):
+        for staff in staff_list:
+            roll = rng.random()
+            if roll < reason_rate:
+                yield Shift(
+                    staff=staff, date=date,
+                    is_deleted_with_reason=True, deletion_reason=rng.choice(REASONS),
+                )
+            elif roll < reason_rate + work_rate:
+                shift_type = rng.choice(shift_types)
+                yield Shift(
+                    staff=staff, shift_type=shift_type, date=date,
+                    start_time=shift_type.start_time, end_time=shift_type.end_time,
+                )
+
+
+def generate(staff=30, shift_types=5, templates=3, years=1, start_date=None,
+             work_rate=0.6, reason_rate=0.05, seed=0):
+    """合成データを作成し、作成件数を返す
+
+    シフトは start_date（既定: 今年の1月1日）から years 年分。
+    """
+    rng = random.Random(seed)
+    if start_date is None:
+        start_date = datetime.date(datetime.date.today().year, 1, 1)
+    end_date = start_date + relativedelta(years=years) - datetime.timedelta(days=1)
+
+    with transaction.atomic(), deferred_shift_changes() as batch:
+        staff_list = _create(Staff, [
+            Staff(name=f'{SYNTHETIC_PREFIX}スタッフ{i + 1:04d}', position=rng.choice(['正社員', 'パート', 'アルバイト']))
+            for i in range(staff)
+        ])
+        type_list = _shift_types(shift_types)
+
+        template_list = _create(ShiftTemplate, [
+            ShiftTemplate(name=f'{SYNTHETIC_PREFIX}テンプレート{i + 1}') for i in range(templates)
+        ])
+        details = []
+        for template in template_list:
+            for member in rng.sample(staff_list, min(len(staff_list), 10)):
+                for weekday in rng.sample(range(7), 5):
+                    shift_type = rng.choice(type_list)
+                    details.append(ShiftTemplateDetail(
+                        template=template, staff=member, shift_type=shift_type, weekday=weekday,
+                        start_time=shift_type.start_time, end_time=shift_type.end_time,
+                    ))
+        ShiftTemplateDetail.objects.bulk_create(details, batch_size=BATCH_SIZE)
+
+        created = 0
+        chunk = []
+        for shift in _shifts(staff_list, type_list, start_date, end_date, work_rate, reason_rate, rng):
+            chunk.append(shift)
+            if len(chunk) >= BATCH_SIZE:
+                Shift.objects.bulk_create(chunk)
+                created += len(chunk)
+                chunk = []
+        Shift.objects.bulk_create(chunk)
+        created += len(chunk)
+        batch.touch(iter_dates(start_date, end_date))
+
+    return {
+        'staff': len(staff_list),
+        'shift_types': len(type_list),
+        'templates': len(template_list),
+        'template_details': len(details),
+        'shifts': created,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+    }
+
+
+def clear():
+    """合成データを削除する（シフト・テンプレート詳細はスタッフの削除に連動する）"""
+    with transaction.atomic(), deferred_shift_changes():
+        Shift.objects.filter(staff__name__startswith=SYNTHETIC_PREFIX).delete()
+        ShiftTemplate.objects.filter(name__startswith=SYNTHETIC_PREFIX).delete()
+        Staff.objects.filter(name__startswith=SYNTHETIC_PREFIX).delete()
+        ShiftType.objects.filter(name__startswith=SYNTHETIC_PREFIX).delete()
@@ -0,0 +1,128 @@
+"""
+時間チャートのデータ取得
+
+統計値は日付ごとの件数をDB側で集計する。バーは1週間ずつJSONで返し、
+スタッフ・シフト種別は参照表として別に送る（バーにはIDと時刻（分）だけを持たせる）。
+"""
+
+import datetime
+import json
+
+from django.db.models import Count, Max, Sum
+
+from .models import Shift, ShiftType, Staff
+from .schedule import iter_dates
+from .staffing import to_minutes
+
+# 時間軸の範囲（6:00から24:00まで）
+START_HOUR = 6
+END_HOUR = 24
+TOTAL_MINUTES = (END_HOUR - START_HOUR) * 60  # 18時間 = 1080分
+
+DEFAULT_BAR_COLOR = '#3498db'
+
+# 1ページに含める日数
+DAYS_PER_PAGE = 7
+
+# バー（ページ）の形式を変えたら上げる
+BARS_FORMAT_VERSION = 1
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def chart_shifts(start_date, end_date):
+    """期間内の時間チャート対象シフト（事由付きシフトは除外）"""
+    return Shift.objects.filter(
+        date__range=[start_date, end_date],
+        is_deleted_with_reason=False,
+    )
+
+
+def _timed_shifts(start_date, end_date):
+    return chart_shifts(start_date, end_date).filter(
+        start_time__isnull=False, end_time__isnull=False,
+    )
+
+
+def daily_stats(start_date, end_date):
+    """チャートに表示されるシフトの合計・1日の最大・1日平均（1クエリ）
+
+    チャートに表示されるのは開始・終了時刻があり、6:00より後に終わるシフト。
+    """
+    per_day = _timed_shifts(start_date, end_date).filter(
+        end_time__gt=datetime.time(START_HOUR),
+    ).values('date').annotate(count=Count('id')).order_by()
+    stats = per_day.aggregate(total=Sum('count'), max_daily=Max('count'))
+    days = (end_date - start_date).days + 1
+    total = stats['total'] or 0
+    return {
+        'total': total,
+        'max_daily': stats['max_daily'] or 0,
+        'avg_daily': round(total / days, 1) if days > 0 else 0,
+    }
+
+
+def iter_shift_times(start_date, end_date):
+    """時刻のあるシフトの (日付, 開始時刻, 終了時刻)"""
+    return _timed_shifts(start_date, end_date).values_list(
+        'date', 'start_time', 'end_time'
+    ).iterator(chunk_size=2000)
+
+
+def page_count(start_date, end_date):
+    return -(-((end_date - start_date).days + 1) // DAYS_PER_PAGE)
+
+
+def lookup_tables():
+    """スタッフ {id: 名前} とシフト種別 {id: [名前, 色]}（種別のないシフトは default_color）"""
+    return {
+        'default_color': DEFAULT_BAR_COLOR,
+        'staff': {staff_id: name for staff_id, name in Staff.objects.values_list('id', 'name')},
+        'shift_types': {
+            type_id: [name, color]
+            for type_id, name, color in ShiftType.objects.values_list('id', 'name', 'color')
+        },
+    }
+
+
+def bars_page(start_date, end_date, page, include_lookups=False):
+    """期間を1週間ずつに区切った page 番目（0始まり）のバー
+
+    バーは [スタッフID, シフト種別ID, 開始分, 終了分]（0:00からの分）で、
+    時間軸の範囲外のシフトは含めない。該当ページがなければ None。
+    """
+    pages = page_count(start_date, end_date)
+    if page < 0 or page >= pages:
+        return None
+    week_start = start_date + datetime.timedelta(days=page * DAYS_PER_PAGE)
+    week_end = min(end_date, week_start + datetime.timedelta(days=DAYS_PER_PAGE - 1))
+
+    bars = {date: [] for date in iter_dates(week_start, week_end)}
+    rows = _timed_shifts(week_start, week_end).filter(
+        end_time__gt=datetime.time(START_HOUR),
+    ).order_by('date', 'start_time').values_list(
+        'date', 'staff_id', 'shift_type_id', 'start_time', 'end_time'
+    )
+    for date, staff_id, shift_type_id, start_time, end_time in rows:
+        bars[date].append([
+            staff_id,
+            shift_type_id,
+            to_minutes(start_time),
+            to_minutes(end_time),
+        ])
+
+    payload = {
+        'version': BARS_FORMAT_VERSION,
+        'page': page,
+        'pages': pages,
+        'next': page + 1 if page + 1 < pages else None,
+        'axis': [START_HOUR, END_HOUR],
+        'days': [[date.isoformat(), day_bars] for date, day_bars in bars.items()],
+    }
+    if include_lookups:
+        payload.update(lookup_tables())
+    return payload
+
+
+def encode_page(payload):
+    return _encoder.encode(payload)
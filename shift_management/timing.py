@@ -0,0 +1,124 @@
+"""
+リクエスト処理時間の内訳（Server-Timing）
+
+ServerTimingMiddleware がリクエストごとに RequestTimer を用意し、
+テンプレート描画・PDFレイアウトなどの区間を phase() で計測する。
+各区間の時間はその中で実行されたSQLの時間と、入れ子の区間の時間を除いた値。
+DB時間は middleware.QueryRecorder で計測し、残りをPythonの処理時間とする。
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.template.backends.django import DjangoTemplates
+
+_current = contextvars.ContextVar('shift_request_timer', default=None)
+
+# Server-Timing に出力する区間（この順で出力する）
+PHASES = ('db', 'template', 'pdf', 'python')
+
+# ヘッダーに載せる説明（ヘッダー値はASCIIに限る）
+PHASE_DESCRIPTIONS = {
+    'db': 'Database',
+    'template': 'Template render',
+    'pdf': 'PDF layout',
+    'python': 'Python',
+    'total': 'Total',
+}
+
+
+class RequestTimer:
+    """1リクエスト分の区間ごとの所要時間（秒）"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.phases = {}
+        self._stack = []
+
+    def stop(self):
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.started
+
+    def enter(self):
+        frame = {'started': time.perf_counter(), 'db': self.recorder.total, 'children': 0.0, 'children_db': 0.0}
+        self._stack.append(frame)
+        return frame
+
+    def leave(self, name, frame):
+        self._stack.pop()
+        elapsed = time.perf_counter() - frame['started']
+        db = self.recorder.total - frame['db']
+        own = elapsed - frame['children'] - (db - frame['children_db'])
+        self.phases[name] = self.phases.get(name, 0.0) + max(own, 0.0)
+        if self._stack:
+            self._stack[-1]['children'] += elapsed
+            self._stack[-1]['children_db'] += db
+
+    def breakdown(self):
+        """{区間名: ミリ秒}（db・python・total を含む）"""
+        total = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        result = {'db': self.recorder.total}
+        for name in PHASES[1:-1]:
+            if name in self.phases:
+                result[name] = self.phases[name]
+        result['python'] = max(total - sum(result.values()), 0.0)
+        result['total'] = total
+        return {name: seconds * 1000 for name, seconds in result.items()}
+
+    def header(self):
+        """Server-Timing ヘッダーの値"""
+        return ', '.join(
+            f'{name};dur={ms:.1f};desc="{PHASE_DESCRIPTIONS.get(name, name)}"'
+            for name, ms in self.breakdown().items()
+        )
+
+
+def start(recorder):
+    timer = RequestTimer(recorder)
+    return timer, _current.set(timer)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """計測中のリクエストがあれば、この区間の時間を name に加算する"""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    frame = timer.enter()
+    try:
+        yield
+    finally:
+        timer.leave(name, frame)
+
+
+class TimedTemplate:
+    """バックエンドのテンプレートを包み、render() を 'template' 区間として計測する"""
+
+    def __init__(self, template):
+        # .template（エンジンのテンプレート）等はバックエンドのものをそのまま見せる
+        self._wrapped = template
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        with phase('template'):
+            return self._wrapped.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """テンプレートの描画時間を 'template' 区間として計測する DjangoTemplates"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
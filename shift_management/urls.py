@@ -24,6 +24,9 @@ urlpatterns = [
     # 複数シフト一括登録（新規追加）
     path('shift/bulk-create/', views.bulk_shift_create, name='bulk_shift_create'),
     
+    # 一括処理ジョブの進捗
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+    
     # シフト種別管理
     path('shift-type/', views.shift_type_list, name='shift_type_list'),
     path('shift-type/create/', views.shift_type_create, name='shift_type_create'),
@@ -46,8 +49,17 @@ urlpatterns = [
     path('api/shifts/', views.api_shifts, name='api_shifts'),
     # ドラッグ＆ドロップ用API（新規追加）
     path('api/shift-update/', views.api_shift_update, name='api_shift_update'),
+    path('api/shift-batch-update/', views.api_shift_batch_update, name='api_shift_batch_update'),
     path('api/shift-delete/', views.api_shift_delete, name='api_shift_delete'),
+    path('api/jobs/<int:pk>/', views.api_job_status, name='api_job_status'),
     
     # 時間チャート
     path('time-chart/', views.time_chart, name='time_chart'),
+    path('api/time-chart/', views.api_time_chart_bars, name='api_time_chart_bars'),
+    
+    # スタッフ別・月別の集計
+    path('summary/', views.monthly_summary, name='monthly_summary'),
+    
+    # Prometheus形式のメトリクス
+    path('metrics', views.prometheus_metrics, name='metrics'),
 ]
@@ -1,20 +1,30 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
 from django.views.decorators.http import require_POST
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.db.models import Q
 from django.urls import reverse
-from django.template.loader import render_to_string
 import json
 import datetime
 import calendar
-import csv
-from io import StringIO
-import tempfile
-import os
-from weasyprint import HTML, CSS
-from .models import Staff, ShiftType, Shift, ShiftTemplate, ShiftTemplateDetail
+from .models import Staff, ShiftType, Shift, ShiftTemplate, ShiftTemplateDetail, ShiftJob
+from .schedule import ScheduleMatrix
+from .staffing import DEFAULT_RESOLUTION, RESOLUTIONS, StaffingCurve
+from .time_chart import (
+    END_HOUR as CHART_END_HOUR, START_HOUR as CHART_START_HOUR, TOTAL_MINUTES,
+    bars_page, daily_stats, encode_page, iter_shift_times
+)
+from .jobs import enqueue, fail_stale_jobs, job_payload, job_threshold
+from .exports import iter_shift_csv, open_shift_pdf
+from .pdf_render import PdfRenderError
+from . import event_cache, metrics, summaries
+from .bulk import (
+    SHIFT_NOT_FOUND, apply_shift_plan, build_bulk_plan, expand_template, move_shifts
+)
+from .events import changes_since, encode_events, parse_cursor
 from .forms import (
     StaffForm, ShiftTypeForm, ShiftForm, ShiftTemplateForm, 
     ShiftTemplateDetailForm, DateRangeForm, TemplateApplyForm,
@@ -42,38 +52,22 @@ def shift_calendar(request):
         start_date = form.cleaned_data['start_date']
         end_date = form.cleaned_data['end_date']
     
-    # 日付範囲内のシフトを取得
-    shifts = Shift.objects.filter(date__range=[start_date, end_date]).select_related('staff', 'shift_type')
-    
     # スタッフ一覧を取得
     staff_list = Staff.objects.filter(is_active=True)
     
     # シフト種別一覧を取得
     shift_types = ShiftType.objects.all()
     
-    # カレンダーデータの作成
-    calendar_data = []
-    current_date = start_date
-    while current_date <= end_date:
-        day_shifts = []
-        for staff in staff_list:
-            staff_shifts = [shift for shift in shifts if shift.staff_id == staff.id and shift.date == current_date]
-            day_shifts.append({
-                'staff': staff,
-                'shifts': staff_shifts
-            })
-        
-        calendar_data.append({
-            'date': current_date,
-            'weekday': current_date.weekday(),
-            'staff_shifts': day_shifts
-        })
-        
-        current_date += datetime.timedelta(days=1)
+    # カレンダー本体はFullCalendarがapi_shiftsから取得するため、
+    # グリッド用データは参照された時だけ構築する（遅延評価）
+    schedule = ScheduleMatrix(
+        Shift.objects.filter(date__range=[start_date, end_date]).select_related('staff', 'shift_type'),
+        start_date, end_date, staff_list
+    )
     
     context = {
         'form': form,
-        'calendar_data': calendar_data,
+        'schedule': schedule,
         'staff_list': staff_list,
         'shift_types': shift_types,
         'start_date': start_date,
@@ -207,43 +201,34 @@ def bulk_shift_create(request):
             end_time = form.cleaned_data['end_time']
             overwrite = form.cleaned_data['overwrite']
             
-            # 日付範囲内の各日に対してシフトを作成
-            current_date = start_date
-            shifts_created = 0
+            # 対象の (スタッフ, 日付) をメモリ上で組み立て、まとめて登録する
+            plan = build_bulk_plan(
+                staff_list, shift_type, start_date, end_date, weekdays, start_time, end_time
+            )
             
-            while current_date <= end_date:
-                weekday = current_date.weekday()
-                
-                # 選択された曜日のみ処理
-                if str(weekday) in weekdays:
-                    for staff in staff_list:
-                        # 既存のシフトをチェック
-                        existing_shifts = Shift.objects.filter(
-                            staff=staff,
-                            date=current_date
-                        )
-                        
-                        if existing_shifts.exists() and not overwrite:
-                            # 既存のシフトがあり、上書きしない設定の場合はスキップ
-                            continue
-                        
-                        # 既存のシフトを削除（上書きする場合）
-                        if existing_shifts.exists() and overwrite:
-                            existing_shifts.delete()
-                        
-                        # 新しいシフトを作成
-                        Shift.objects.create(
-                            staff=staff,
-                            shift_type=shift_type,
-                            date=current_date,
-                            start_time=start_time,
-                            end_time=end_time
-                        )
-                        shifts_created += 1
-                
-                current_date += datetime.timedelta(days=1)
+            if len(plan) > job_threshold():
+                # 件数が多い場合はリクエスト外のワーカーで実行し、進捗画面へ
+                job = enqueue('bulk_shift_create', {
+                    'staff_ids': [staff.id for staff in staff_list],
+                    'shift_type_id': shift_type.id,
+                    'start_date': start_date.isoformat(),
+                    'end_date': end_date.isoformat(),
+                    'weekdays': weekdays,
+                    'start_time': start_time.strftime('%H:%M'),
+                    'end_time': end_time.strftime('%H:%M'),
+                    'overwrite': overwrite,
+                })
+                messages.info(request, '登録件数が多いため、バックグラウンドで処理します。')
+                return redirect('shift_management:job_status', pk=job.pk)
             
-            messages.success(request, f'{shifts_created}件のシフトを一括登録しました。')
+            result = apply_shift_plan(plan, overwrite=overwrite)
+            metrics.record_shift_plan('bulk_shift_create', result['created'])
+            
+            messages.success(
+                request,
+                f"{result['created']}件のシフトを一括登録しました。"
+                f"（上書き{result['overwritten']}件、スキップ{result['skipped']}件）"
+            )
             return redirect(f"{reverse('shift_management:calendar')}?refresh_calendar=true")
     else:
         # デフォルトでは今日から1週間を設定
@@ -376,6 +361,9 @@ def template_delete(request, pk):
     
     return render(request, 'shift_management/template_delete.html', {'template': template})
 
+# テンプレート適用プレビューで種別ごとに表示する最大件数
+TEMPLATE_PREVIEW_LIMIT = 200
+
 def template_apply(request, pk):
     """シフトテンプレートを適用"""
     template = get_object_or_404(ShiftTemplate, pk=pk)
@@ -387,47 +375,50 @@ def template_apply(request, pk):
             end_date = form.cleaned_data['end_date']
             overwrite = form.cleaned_data['overwrite']
             
-            # テンプレート詳細を取得
-            details = ShiftTemplateDetail.objects.filter(template=template)
+            # テンプレートを期間に展開し、既存シフトとの差分をまとめて反映
+            plan = expand_template(template, start_date, end_date)
             
-            # 日付範囲内の各日に対してテンプレートを適用
-            current_date = start_date
-            shifts_created = 0
+            if 'preview' in request.POST:
+                # ドライラン: 書き込まずに登録・上書き・スキップの予定を表示
+                result = apply_shift_plan(plan, overwrite=overwrite, dry_run=True)
+                diff = result['diff']
+                preview_sections = [
+                    {'label': label, 'badge': badge, 'count': len(diff[key]),
+                     'rows': diff[key][:TEMPLATE_PREVIEW_LIMIT]}
+                    for key, label, badge in [
+                        ('inserts', '新規登録', 'success'),
+                        ('overwrites', '上書き', 'warning'),
+                        ('skips', 'スキップ（既存シフトあり）', 'secondary'),
+                    ]
+                ]
+                context = {
+                    'form': form,
+                    'template': template,
+                    'preview': result,
+                    'preview_sections': preview_sections,
+                    'preview_limit': TEMPLATE_PREVIEW_LIMIT,
+                }
+                return render(request, 'shift_management/template_apply.html', context)
             
-            while current_date <= end_date:
-                weekday = current_date.weekday()
-                
-                # その曜日に該当するテンプレート詳細を取得
-                day_details = [d for d in details if d.weekday == weekday]
-                
-                for detail in day_details:
-                    # 既存のシフトをチェック
-                    existing_shifts = Shift.objects.filter(
-                        staff=detail.staff,
-                        date=current_date
-                    )
-                    
-                    if existing_shifts.exists() and not overwrite:
-                        # 既存のシフトがあり、上書きしない設定の場合はスキップ
-                        continue
-                    
-                    # 既存のシフトを削除（上書きする場合）
-                    if existing_shifts.exists() and overwrite:
-                        existing_shifts.delete()
-                    
-                    # 新しいシフトを作成
-                    Shift.objects.create(
-                        staff=detail.staff,
-                        shift_type=detail.shift_type,
-                        date=current_date,
-                        start_time=detail.start_time,
-                        end_time=detail.end_time
-                    )
-                    shifts_created += 1
-                
-                current_date += datetime.timedelta(days=1)
+            if len(plan) > job_threshold():
+                # 件数が多い場合はリクエスト外のワーカーで実行し、進捗画面へ
+                job = enqueue('template_apply', {
+                    'template_id': template.pk,
+                    'start_date': start_date.isoformat(),
+                    'end_date': end_date.isoformat(),
+                    'overwrite': overwrite,
+                })
+                messages.info(request, '登録件数が多いため、バックグラウンドで処理します。')
+                return redirect('shift_management:job_status', pk=job.pk)
+            
+            result = apply_shift_plan(plan, overwrite=overwrite)
+            metrics.record_shift_plan('template_apply', result['created'])
             
-            messages.success(request, f'テンプレートを適用し、{shifts_created}件のシフトを作成しました。')
+            messages.success(
+                request,
+                f"テンプレートを適用し、{result['created']}件のシフトを作成しました。"
+                f"（上書き{result['overwritten']}件、スキップ{result['skipped']}件）"
+            )
             return redirect(f"{reverse('shift_management:calendar')}?refresh_calendar=true")
     else:
         # デフォルトでは翌週の月曜から日曜までを設定
@@ -475,105 +466,30 @@ def shift_export(request):
             else:
                 staff_list = Staff.objects.filter(is_active=True)
             
-            # シフトデータ取得
-            shifts = Shift.objects.filter(
-                date__range=[start_date, end_date],
-                staff__in=staff_list
-            ).select_related('staff', 'shift_type').order_by('date', 'start_time')
-            
-            # 日付範囲の全日付リスト作成
-            date_list = []
-            current_date = start_date
-            while current_date <= end_date:
-                date_list.append(current_date)
-                current_date += datetime.timedelta(days=1)
-            
             # 出力形式に応じた処理
             if format_type == 'pdf':
-                # PDF出力
-                context = {
-                    'start_date': start_date,
-                    'end_date': end_date,
-                    'staff_list': staff_list,
-                    'date_list': date_list,
-                    'shifts': shifts,
-                }
-                
-                # HTMLテンプレートをレンダリング
-                html_string = render_to_string('shift_management/shift_pdf_template.html', context)
-                
-                # WeasyPrintでPDF生成
-                html = HTML(string=html_string)
-                css = CSS(string='''
-                    @page {
-                        size: A4 landscape;
-                        margin: 1cm;
-                    }
-                    body {
-                        font-family: sans-serif;
-                    }
-                    table {
-                        width: 100%;
-                        border-collapse: collapse;
-                    }
-                    th, td {
-                        border: 1px solid #ddd;
-                        padding: 4px;
-                        text-align: center;
-                        font-size: 12px;
-                    }
-                    th {
-                        background-color: #f2f2f2;
-                    }
-                    .shift-entry {
-                        margin-bottom: 2px;
-                        padding: 2px;
-                        border-radius: 3px;
-                    }
-                ''')
-                
-                # PDFファイル生成
-                pdf_file = html.write_pdf(stylesheets=[css])
-                
-                # レスポンス作成
-                response = HttpResponse(pdf_file, content_type='application/pdf')
+                # PDF出力（同じ内容のPDFはキャッシュから返す）
+                try:
+                    pdf_file = open_shift_pdf(staff_list, start_date, end_date)
+                except PdfRenderError as e:
+                    messages.error(request, str(e))
+                    return render(request, 'shift_management/shift_export.html', {'form': form})
+                metrics.inc('shift_exports_total', label='pdf')
                 filename = f'shift_table_{start_date.strftime("%Y%m%d")}-{end_date.strftime("%Y%m%d")}.pdf'
-                response['Content-Disposition'] = f'attachment; filename="{filename}"'
-                
-                return response
+                return FileResponse(
+                    pdf_file, content_type='application/pdf', as_attachment=True, filename=filename
+                )
                 
             elif format_type == 'csv':
-                # CSV出力
-                response = HttpResponse(content_type='text/csv')
+                # CSV出力（スタッフ1人分ずつ生成しながら送信する）
+                response = StreamingHttpResponse(
+                    iter_shift_csv(staff_list, start_date, end_date),
+                    content_type='text/csv'
+                )
+                metrics.inc('shift_exports_total', label='csv')
                 filename = f'shift_table_{start_date.strftime("%Y%m%d")}-{end_date.strftime("%Y%m%d")}.csv'
                 response['Content-Disposition'] = f'attachment; filename="{filename}"'
                 
-                # CSVライター設定
-                response.write('\ufeff')  # BOMを追加してExcelでの文字化け対策
-                writer = csv.writer(response)
-                
-                # ヘッダー行
-                header = ['スタッフ名']
-                for date in date_list:
-                    header.append(f'{date.strftime("%Y/%m/%d")}({["月","火","水","木","金","土","日"][date.weekday()]})')
-                writer.writerow(header)
-                
-                # スタッフごとの行
-                for staff in staff_list:
-                    row = [staff.name]
-                    for date in date_list:
-                        # その日のシフトを取得
-                        day_shifts = [s for s in shifts if s.staff_id == staff.id and s.date == date]
-                        if day_shifts:
-                            shift_texts = []
-                            for shift in day_shifts:
-                                shift_type_name = shift.shift_type.name if shift.shift_type else "未設定"
-                                shift_texts.append(f'{shift_type_name} {shift.start_time.strftime("%H:%M")}-{shift.end_time.strftime("%H:%M")}')
-                            row.append('\n'.join(shift_texts))
-                        else:
-                            row.append('')
-                    writer.writerow(row)
-                
                 return response
     else:
         # デフォルトでは今月の1日から末日までを設定
@@ -595,67 +511,50 @@ def shift_export(request):
 
 def api_shifts(request):
     """シフトデータをJSON形式で返すAPI"""
-    print("[DEBUG] api_shifts called") # DEBUG
     start_date_str = request.GET.get('start')
     end_date_str = request.GET.get('end')
     
-    print(f"[DEBUG] Received start_date_str: {start_date_str}, end_date_str: {end_date_str}") # DEBUG
-
     if not start_date_str or not end_date_str:
-        print("[DEBUG] Error: Start date or end date not provided") # DEBUG
         return JsonResponse({'error': '開始日と終了日を指定してください'}, status=400)
     
     try:
-        print(f"[DEBUG] Attempting to parse dates: start={start_date_str}, end={end_date_str}") # DEBUG
         # ISO形式の日付文字列から日付部分のみを抽出
         start_date_iso = start_date_str.split('T')[0]
         end_date_iso = end_date_str.split('T')[0]
         start_date = datetime.datetime.strptime(start_date_iso, '%Y-%m-%d').date()
         end_date = datetime.datetime.strptime(end_date_iso, '%Y-%m-%d').date()
-        print(f"[DEBUG] Parsed dates: start_date={start_date}, end_date={end_date}") # DEBUG
     except ValueError:
-        print(f"[DEBUG] Error: Date format incorrect for start={start_date_str} or end={end_date_str}") # DEBUG
         return JsonResponse({'error': '日付形式が正しくありません'}, status=400)
     
-    print(f"[DEBUG] Querying shifts between {start_date} and {end_date}") # DEBUG
-    shifts = Shift.objects.filter(date__range=[start_date, end_date]).select_related('staff', 'shift_type')
-    print(f"[DEBUG] Found {shifts.count()} shifts") # DEBUG
-    
-    events = []
-    for shift in shifts:
-        if shift.is_deleted_with_reason:
-            # 事由付きの場合は灰色で表示
-            events.append({
-                'id': shift.id,
-                'title': f'{shift.staff.name} ({shift.get_deletion_reason_display()})',
-                'start': f'{shift.date.isoformat()}',  # 終日イベントとして表示
-                'allDay': True,
-                'color': '#6c757d',  # グレー
-                'textColor': '#ffffff',
-                'staff_id': shift.staff.id,
-                'shift_type_id': None,
-                'is_reason': True,
-                'reason': shift.deletion_reason,
-            })
-        else:
-            # 通常のシフトの場合
-            events.append({
-                'id': shift.id,
-                'title': f'{shift.staff.name} ({shift.shift_type.name if shift.shift_type else "未設定"})',
-                'start': f'{shift.date.isoformat()}T{shift.start_time.isoformat()}',
-                'end': f'{shift.date.isoformat()}T{shift.end_time.isoformat()}',
-                'color': shift.shift_type.color if shift.shift_type else '#3498db',
-                'staff_id': shift.staff.id,
-                'shift_type_id': shift.shift_type.id if shift.shift_type else None,
-                'is_reason': False,
-            })
-    
-    if events: # DEBUG
-        print(f"[DEBUG] First event example: {events[0]}") # DEBUG
-    else: # DEBUG
-        print("[DEBUG] No events generated") # DEBUG
-        
-    return JsonResponse(events, safe=False)
+    # 差分同期: since 以降の変更分だけを返す
+    since_str = request.GET.get('since')
+    if since_str:
+        try:
+            since = parse_cursor(since_str)
+        except (ValueError, OverflowError, OSError):
+            return JsonResponse({'error': '同期カーソルが正しくありません'}, status=400)
+        payload = encode_events(changes_since(start_date, end_date, since))
+        response = HttpResponse(payload, content_type='application/json')
+        patch_cache_control(response, no_store=True)
+        return response
+    
+    # 月単位キャッシュからイベントを取得（未キャッシュの月のみDBから構築）
+    events = event_cache.load_range(start_date, end_date)
+    
+    # データに変更がなければ本文を組み立てずに304を返す
+    not_modified = get_conditional_response(
+        request, etag=events.etag, last_modified=events.last_modified
+    )
+    if not_modified is not None:
+        return not_modified
+    
+    response = HttpResponse(events.payload(), content_type='application/json')
+    response['ETag'] = events.etag
+    response['Last-Modified'] = http_date(events.last_modified)
+    response['X-Sync-Cursor'] = events.cursor
+    # ブラウザにキャッシュさせつつ毎回再検証させる
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @require_POST
 def api_shift_update(request):
@@ -668,29 +567,50 @@ def api_shift_update(request):
     if not all([shift_id, new_date, new_start_time, new_end_time]):
         return JsonResponse({'error': '必要なパラメータが不足しています'}, status=400)
     
+    # 一括更新と同じ検証・更新処理を1件分で実行
+    result, = move_shifts([{
+        'shift_id': shift_id,
+        'new_date': new_date,
+        'new_start_time': new_start_time,
+        'new_end_time': new_end_time,
+    }])
+    if not result['success']:
+        status = 404 if result['error'] == SHIFT_NOT_FOUND else 400
+        return JsonResponse({'error': result['error']}, status=status)
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'シフトを更新しました',
+        'shift_id': result['shift_id'],
+        'date': result['date'],
+        'start_time': result['start_time'],
+        'end_time': result['end_time']
+    })
+
+@require_POST
+def api_shift_batch_update(request):
+    """複数シフトの移動・リサイズを一括で反映するAPI
+
+    リクエスト本文（JSON）: {"changes": [{"shift_id", "new_date", "new_start_time", "new_end_time"}, ...]}
+    """
     try:
-        shift = Shift.objects.get(pk=shift_id)
-        shift.date = datetime.datetime.strptime(new_date, '%Y-%m-%d').date()
-        
-        # 時間の変換
-        from django.utils.dateparse import parse_time
-        shift.start_time = parse_time(new_start_time)
-        shift.end_time = parse_time(new_end_time)
-        
-        shift.save()
-        
-        return JsonResponse({
-            'success': True,
-            'message': 'シフトを更新しました',
-            'shift_id': shift.id,
-            'date': shift.date.isoformat(),
-            'start_time': shift.start_time.isoformat(),
-            'end_time': shift.end_time.isoformat()
-        })
-    except Shift.DoesNotExist:
-        return JsonResponse({'error': '指定されたシフトが見つかりません'}, status=404)
-    except Exception as e:
-        return JsonResponse({'error': f'エラーが発生しました: {str(e)}'}, status=500)
+        body = json.loads(request.body or b'{}')
+        changes = body.get('changes')
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'リクエスト本文のJSONが正しくありません'}, status=400)
+    
+    if not isinstance(changes, list) or not changes:
+        return JsonResponse({'error': 'changesに変更内容を指定してください'}, status=400)
+    if not all(isinstance(change, dict) for change in changes):
+        return JsonResponse({'error': 'changesの各要素はオブジェクトで指定してください'}, status=400)
+    
+    results = move_shifts(changes)
+    updated = sum(1 for result in results if result['success'])
+    return JsonResponse({
+        'success': updated == len(results),
+        'updated': updated,
+        'results': results,
+    })
 
 @require_POST
 def api_shift_delete(request):
@@ -705,6 +625,18 @@ def api_shift_delete(request):
     except Shift.DoesNotExist:
         return JsonResponse({'error': 'シフトが存在しません'}, status=404)
 
+def job_status(request, pk):
+    """一括処理ジョブの進捗表示"""
+    job = get_object_or_404(ShiftJob, pk=pk)
+    fail_stale_jobs(job)
+    return render(request, 'shift_management/job_status.html', {'job': job})
+
+def api_job_status(request, pk):
+    """一括処理ジョブの進捗をJSON形式で返すAPI（進捗画面からポーリングされる）"""
+    job = get_object_or_404(ShiftJob, pk=pk)
+    fail_stale_jobs(job)
+    return JsonResponse(job_payload(job))
+
 def time_chart(request):
     """時間チャート表示"""
     # 表示期間の設定（デフォルトは今月）
@@ -731,112 +663,108 @@ def time_chart(request):
         start_date = datetime.date(year, month, 1)
         end_date = datetime.date(year, month, last_day)
     
-    # 期間内のシフトを取得
-    shifts = Shift.objects.filter(
-        date__range=[start_date, end_date],
-        is_deleted_with_reason=False  # 事由付きシフトは除外
-    ).select_related('staff', 'shift_type').order_by('date', 'start_time')
+    # 人数を集計する時間の単位（分）
+    try:
+        resolution = int(request.GET.get('resolution', DEFAULT_RESOLUTION))
+    except ValueError:
+        resolution = DEFAULT_RESOLUTION
+    if resolution not in RESOLUTIONS:
+        resolution = DEFAULT_RESOLUTION
     
     # スタッフ一覧を取得
     staff_list = Staff.objects.filter(is_active=True).order_by('name')
     
-    # 日付リストを作成
-    date_list = []
-    current_date = start_date
-    while current_date <= end_date:
-        date_list.append(current_date)
-        current_date += datetime.timedelta(days=1)
-    
-    # 時間軸の設定（6:00から24:00まで）
-    start_hour = 6
-    end_hour = 24
-    total_minutes = (end_hour - start_hour) * 60  # 18時間 = 1080分
-    
-    # 日付別のシフトデータを整理
-    chart_data = {}
-    for date in date_list:
-        chart_data[date] = []
-    
-    # シフトデータを日付別に分類
-    for shift in shifts:
-        if shift.start_time and shift.end_time and shift.date in chart_data:
-            # 開始時間と終了時間を分単位で計算（6:00を0分とする）
-            start_minutes = max(0, (shift.start_time.hour - start_hour) * 60 + shift.start_time.minute)
-            end_minutes = min(total_minutes, (shift.end_time.hour - start_hour) * 60 + shift.end_time.minute)
-            
-            # 有効な時間範囲内のシフトのみ追加
-            if start_minutes < total_minutes and end_minutes > 0:
-                # パーセンテージを計算
-                left_percent = (start_minutes / total_minutes) * 100
-                width_percent = ((end_minutes - start_minutes) / total_minutes) * 100
-                
-                chart_data[shift.date].append({
-                    'staff_name': shift.staff.name,
-                    'shift_type': shift.shift_type.name if shift.shift_type else '未設定',
-                    'start_minutes': start_minutes,
-                    'end_minutes': end_minutes,
-                    'duration': end_minutes - start_minutes,
-                    'left_percent': round(left_percent, 2),
-                    'width_percent': round(width_percent, 2),
-                    'color': shift.shift_type.color if shift.shift_type else '#3498db',
-                    'start_time': shift.start_time,
-                    'end_time': shift.end_time,
-                })
-    
     # 時間軸のラベルを作成
-    time_labels = []
-    for hour in range(start_hour, end_hour + 1):
-        time_labels.append(f"{hour:02d}:00")
-    
-    # 統計情報を計算
-    total_shifts = sum(len(chart_data[date]) for date in date_list)
-    max_daily_shifts = max(len(chart_data[date]) for date in date_list) if date_list else 0
-    avg_daily_shifts = round(total_shifts / len(date_list), 1) if date_list else 0
-    
-    # 時間別のシフト数を計算してピーク時間を特定
-    hourly_counts = {}
-    for hour in range(start_hour, end_hour):
-        hourly_counts[f"{hour:02d}:00"] = 0
-    
-    for date in date_list:
-        for shift in chart_data[date]:
-            start_hour_shift = shift['start_time'].hour
-            end_hour_shift = shift['end_time'].hour
-            
-            # シフトが含まれる時間帯をカウント
-            for hour in range(max(start_hour, start_hour_shift), min(end_hour, end_hour_shift + 1)):
-                hour_key = f"{hour:02d}:00"
-                if hour_key in hourly_counts:
-                    hourly_counts[hour_key] += 1
+    time_labels = [f"{hour:02d}:00" for hour in range(CHART_START_HOUR, CHART_END_HOUR + 1)]
+    
+    # 統計情報（日付ごとの件数をDBで集計）
+    stats = daily_stats(start_date, end_date)
     
-    # ピーク時間を特定
-    peak_time = '-'
-    if hourly_counts and max(hourly_counts.values()) > 0:
-        peak_time = max(hourly_counts, key=hourly_counts.get)
+    # 時間帯別の勤務人数（差分配列＋累積和）からピーク・谷の時間帯を求める
+    # （前日からの夜勤も数えるため前日分から渡す。バーは api_time_chart_bars から1週間ずつ取得して描画する）
+    staffing = StaffingCurve.from_shifts(
+        iter_shift_times(start_date - datetime.timedelta(days=1), end_date), start_date, end_date, resolution
+    )
+    peak_time = '、'.join(f"{p['start']}〜{p['end']}" for p in staffing.peaks()) or '-'
+    trough_time = '、'.join(f"{p['start']}〜{p['end']}" for p in staffing.troughs()) or '-'
+    coverage = staffing.summary(CHART_START_HOUR * 60, CHART_END_HOUR * 60)
     
     # フォーム用の初期値
     form_data = {
         'start_date': start_date,
-        'end_date': end_date
+        'end_date': end_date,
+        'resolution': resolution,
     }
     
     context = {
-        'chart_data': chart_data,
-        'date_list': date_list,
         'time_labels': time_labels,
         'staff_list': staff_list,
         'form_data': form_data,
         'start_date': start_date,
         'end_date': end_date,
-        'start_hour': start_hour,
-        'end_hour': end_hour,
-        'total_minutes': total_minutes,
+        'start_hour': CHART_START_HOUR,
+        'end_hour': CHART_END_HOUR,
+        'total_minutes': TOTAL_MINUTES,
         # 統計情報
-        'max_staff_count': max_daily_shifts,
-        'avg_staff_count': avg_daily_shifts,
+        'max_staff_count': stats['max_daily'],
+        'avg_staff_count': stats['avg_daily'],
         'peak_time': peak_time,
-        'total_days': len(date_list),
-        'total_shifts': total_shifts,
+        'trough_time': trough_time,
+        'coverage': coverage,
+        'resolution_choices': RESOLUTIONS,
+        'total_days': (end_date - start_date).days + 1,
+        'total_shifts': stats['total'],
     }
     
     return render(request, 'shift_management/time_chart.html', context)
+
+def api_time_chart_bars(request):
+    """時間チャートのバーを1週間ずつJSON形式で返すAPI
+
+    page は0始まり。スタッフ・シフト種別の参照表は最初のページ（または lookups=1 指定時）にだけ含める。
+    """
+    try:
+        start_date = datetime.datetime.strptime(request.GET.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(request.GET.get('end', ''), '%Y-%m-%d').date()
+        page = int(request.GET.get('page', 0))
+    except ValueError:
+        return JsonResponse({'error': '開始日・終了日（YYYY-MM-DD）とページ番号を正しく指定してください'}, status=400)
+    
+    include_lookups = page == 0 or request.GET.get('lookups') == '1'
+    payload = bars_page(start_date, end_date, page, include_lookups)
+    if payload is None:
+        return JsonResponse({'error': 'ページが範囲外です'}, status=404)
+    return HttpResponse(encode_page(payload), content_type='application/json')
+
+def monthly_summary(request):
+    """スタッフ別・月別の勤務時間と事由の件数（StaffMonthlySummary から表示）"""
+    try:
+        year = int(request.GET.get('year', timezone.now().year))
+    except ValueError:
+        year = timezone.now().year
+    # date で扱える範囲（1〜9999年）に収める
+    year = min(max(year, datetime.MINYEAR), datetime.MAXYEAR)
+    
+    # 有効なスタッフと、その年に集計のある無効なスタッフ
+    staff_list = list(Staff.objects.filter(
+        Q(is_active=True) | Q(monthly_summaries__month__year=year)
+    ).distinct().order_by('name'))
+    report = summaries.year_report(year, staff_list)
+    
+    context = {
+        'year': year,
+        'previous_year': year - 1 if year > datetime.MINYEAR else None,
+        'next_year': year + 1 if year < datetime.MAXYEAR else None,
+        'months': range(1, 13),
+        'rows': report['rows'],
+        'month_hours': report['month_hours'],
+        'total_hours': summaries.minutes_to_hours(sum(row['totals']['scheduled_minutes'] for row in report['rows'])),
+        'reason_columns': [label for _, label in summaries.REASON_COLUMNS],
+    }
+    return render(request, 'shift_management/monthly_summary.html', context)
+
+def prometheus_metrics(request):
+    """Prometheus形式のメトリクス（スタッフユーザー、または SHIFT_METRICS_TOKEN の Bearer トークン）"""
+    if not metrics.is_authorized(request):
+        return HttpResponse('メトリクスを参照する権限がありません', status=403, content_type='text/plain; charset=utf-8')
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)